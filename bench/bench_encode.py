@@ -0,0 +1,156 @@
+"""Measure how long storing a render takes per megapixel for each encoder setting
+
+Runs the server's own save path (decode the PNG, encode, write) on noisy images like
+the stub ComfyUI's, which compress about as badly as real renders. --parallel also
+saves a burst of images through the process pool and through threads, the fallback
+when COMFY_ENCODE_WORKERS is 0, to show what the pool buys on this machine.
+--thumbnails adds an inline thumbnail to the default save for each budget of long
+side and KB, as COMFY_THUMBNAIL_SIZE and COMFY_THUMBNAIL_KB set them, and reports
+what it costs on top of the save and how much it adds to a tool result.
+
+    python bench/bench_encode.py --sizes 1024x1024,2048x2048 --repeat 3
+    python bench/bench_encode.py --parallel 8
+    python bench/bench_encode.py --thumbnails 256:32,512:64,768:128
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from comfy_mcp_server.encoding import EncodeOptions, ImageEncoder, default_workers, save_image  # noqa: E402
+from stub_comfyui import make_png  # noqa: E402
+
+SETTINGS = [
+    ("png (kept as is)", EncodeOptions(format="png")),
+    *[(f"webp q{quality} m{method}", EncodeOptions(quality=quality, method=method))
+      for quality in (75, 85, 95) for method in (0, 4, 6)],
+    *[(f"webp lossless m{method}", EncodeOptions(lossless=True, method=method)) for method in (0, 6)],
+]
+
+
+def save_once(png: bytes, workdir: str, options: EncodeOptions) -> tuple[dict, int, bytes | None]:
+    source = os.path.join(workdir, "render.part")
+    with open(source, "wb") as f:
+        f.write(png)
+    local_path, error, thumbnail, timings = save_image(source, os.path.join(workdir, "render"), options)
+    if error is not None:
+        raise RuntimeError(error)
+    size = os.path.getsize(local_path)
+    os.remove(local_path)
+    return timings, size, thumbnail
+
+
+def thumbnail_rows(png: bytes, workdir: str, size: str, budgets: list[tuple[int, int]], repeat: int) -> list[dict]:
+    """What an inline thumbnail adds to the default save, for each budget of long side and KB"""
+    rows = []
+    for max_size, kb in budgets:
+        options = EncodeOptions(thumbnail=max_size, thumbnail_bytes=kb * 1024)
+        runs = [save_once(png, workdir, options) for _ in range(repeat)]
+        thumbnail = runs[-1][2]
+        rows.append({
+            "size": size,
+            "budget": f"{max_size}px {kb} KB",
+            "thumbnail_ms": statistics.median(t["thumbnail"] for t, _, _ in runs) * 1000,
+            "save_ms": statistics.median(sum(v for stage, v in t.items() if stage != "thumbnail")
+                                         for t, _, _ in runs) * 1000,
+            "thumbnail_kb": len(thumbnail) / 1024,
+            # Tool results carry images as base64
+            "payload_kb": len(base64.b64encode(thumbnail)) / 1024,
+            "within_budget": len(thumbnail) <= kb * 1024,
+        })
+    return rows
+
+
+async def burst(png: bytes, workdir: str, options: EncodeOptions, count: int, workers: int) -> float:
+    """Save count images at once, returning the wall time"""
+    encoder = ImageEncoder(workers)
+    # One save first, so starting the workers isn't timed
+    sources = [os.path.join(workdir, "warm.part")]
+    with open(sources[0], "wb") as f:
+        f.write(png)
+    await encoder.save(sources[0], sources[0][:-5], options)
+    sources = []
+    for i in range(count):
+        sources.append(os.path.join(workdir, f"burst_{i}.part"))
+        with open(sources[-1], "wb") as f:
+            f.write(png)
+    started = time.perf_counter()
+    await asyncio.gather(*[encoder.save(source, source[:-5], options) for source in sources])
+    elapsed = time.perf_counter() - started
+    encoder.shutdown()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1024x1024,2048x2048", help="comma separated WIDTHxHEIGHT")
+    parser.add_argument("--repeat", type=int, default=3, help="saves per setting, the median is reported")
+    parser.add_argument("--parallel", type=int, default=0, help="also save this many images at once")
+    parser.add_argument("--workers", type=int, default=default_workers(), help="process pool size for --parallel")
+    parser.add_argument("--thumbnails", type=lambda s: [tuple(int(n) for n in b.split(":")) for b in s.split(",")],
+                        default=[], help="comma separated thumbnail budgets as LONG_SIDE:KB")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    rows = []
+    workdir = tempfile.mkdtemp(prefix="comfy_mcp_encode_")
+    try:
+        for size in args.sizes.split(","):
+            width, height = (int(n) for n in size.lower().split("x"))
+            megapixels = width * height / 1e6
+            png = make_png(width, height)
+            for name, options in SETTINGS:
+                runs = [save_once(png, workdir, options) for _ in range(args.repeat)]
+                median = {stage: statistics.median(t.get(stage, 0.0) for t, _, _ in runs)
+                          for stage in ("decode", "encode", "write")}
+                rows.append({
+                    "size": size,
+                    "setting": name,
+                    "encode_ms_per_mp": median["encode"] * 1000 / megapixels,
+                    "decode_ms": median["decode"] * 1000,
+                    "encode_ms": median["encode"] * 1000,
+                    "write_ms": median["write"] * 1000,
+                    "png_kb": len(png) / 1024,
+                    "output_kb": runs[-1][1] / 1024,
+                })
+            if args.thumbnails:
+                rows.extend(thumbnail_rows(png, workdir, size, args.thumbnails, args.repeat))
+            if args.parallel:
+                options = EncodeOptions()
+                pooled = asyncio.run(burst(png, workdir, options, args.parallel, args.workers))
+                threaded = asyncio.run(burst(png, workdir, options, args.parallel, 0))
+                rows.append({"size": size, "setting": f"burst of {args.parallel}, default webp",
+                             "pool_seconds": pooled, "pool_workers": args.workers, "thread_seconds": threaded})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print("size       setting               ms/MP  decode ms  encode ms  write ms   PNG KB   out KB")
+    for row in rows:
+        if "thumbnail_ms" in row:
+            print(f"{row['size']:<10} thumbnail {row['budget']}: +{row['thumbnail_ms']:.0f} ms on a"
+                  f" {row['save_ms']:.0f} ms save, {row['thumbnail_kb']:.0f} KB, {row['payload_kb']:.0f} KB as base64"
+                  + ("" if row["within_budget"] else ", over budget"))
+            continue
+        if "pool_seconds" in row:
+            print(f"{row['size']:<10} {row['setting']}: {row['pool_seconds']:.2f} s with {row['pool_workers']}"
+                  f" workers, {row['thread_seconds']:.2f} s in threads")
+            continue
+        print(f"{row['size']:<10} {row['setting']:<20} {row['encode_ms_per_mp']:>6.0f} {row['decode_ms']:>10.0f}"
+              f" {row['encode_ms']:>10.0f} {row['write_ms']:>9.1f} {row['png_kb']:>8.0f} {row['output_kb']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Measure how long the stdio MCP server takes to start and what it imports on the way
+
+Two reports, both from this checkout:
+- an `-X importtime` profile of importing the server, with its slowest imports and
+  whether the optional heavy dependencies (langchain, Pillow, websockets) were loaded;
+- time-to-ready over stdio: spawn to initialize answered, to tools listed, and to the
+  first tool call served, as an MCP client sees it. No ComfyUI is contacted.
+
+    python bench/bench_startup.py --runs 5
+    python bench/bench_startup.py --ollama   # with generate_prompt registered
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_WORKFLOW = os.path.join(ROOT, "workflow", "image_z_image_turbo.json")
+# Loaded only by the features that need them
+HEAVY_MODULES = ("langchain_ollama", "langchain_core", "PIL", "websockets")
+
+
+def server_env(args: argparse.Namespace) -> dict:
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [os.path.join(ROOT, "src"), os.environ.get("PYTHONPATH")])),
+        # Never contacted: nothing here renders
+        COMFY_URL="http://127.0.0.1:9",
+        COMFY_WORKFLOW_JSON_FILE=args.workflow,
+        COMFY_CACHE="false",
+    )
+    if args.ollama:
+        env.update(OLLAMA_API_BASE="http://127.0.0.1:9", PROMPT_LLM="stub")
+    return env
+
+
+def import_profile(args: argparse.Namespace) -> dict:
+    """Import the server module under -X importtime and sum up its report"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import comfy_mcp_server.server"],
+        env=server_env(args), capture_output=True, text=True, check=True)
+    modules, direct, children = [], [], []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nesting is shown by two spaces per level past the one after the bar
+        name = name.rstrip()[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(cumulative)))
+        # A module's imports are listed before it, so collect them until it shows up
+        if depth == 1:
+            children.append(modules[-1])
+        elif depth == 0:
+            if name == "comfy_mcp_server.server":
+                server_us, direct = int(cumulative), children
+            children = []
+    loaded = {name.split(".")[0] for name, _ in modules}
+    return {
+        "total_ms": server_us / 1000,
+        "slowest": [{"module": name, "cumulative_ms": us / 1000}
+                    for name, us in sorted(direct, key=lambda m: -m[1])[:args.top]],
+        "heavy_loaded": {module: module in loaded for module in HEAVY_MODULES},
+    }
+
+
+async def time_to_ready(args: argparse.Namespace) -> dict:
+    server = StdioServerParameters(command=sys.executable, args=["-m", "comfy_mcp_server"], env=server_env(args))
+    started = time.perf_counter()
+    with open(os.devnull, "w") as errlog:
+        async with stdio_client(server, errlog=errlog) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                initialized = time.perf_counter()
+                await session.list_tools()
+                listed = time.perf_counter()
+                await session.call_tool("list_workflows", {})
+                called = time.perf_counter()
+    return {
+        "initialize_ms": (initialized - started) * 1000,
+        "list_tools_ms": (listed - started) * 1000,
+        "first_call_ms": (called - started) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="server starts timed, the median is reported")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports of the server module to list")
+    parser.add_argument("--ollama", action="store_true", help="configure Ollama so generate_prompt is registered")
+    parser.add_argument("--workflow", default=DEFAULT_WORKFLOW)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    profile = import_profile(args)
+    runs = [asyncio.run(time_to_ready(args)) for _ in range(args.runs)]
+    ready = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+    if args.json:
+        print(json.dumps({"imports": profile, "ready": ready, "runs": runs}, indent=2))
+        return
+    print(f"Importing the server: {profile['total_ms']:.0f} ms")
+    for module in profile["slowest"]:
+        print(f"  {module['cumulative_ms']:8.1f} ms  {module['module']}")
+    print("Optional dependencies loaded at import: " + ", ".join(
+        f"{module} {'yes' if loaded else 'no'}" for module, loaded in profile["heavy_loaded"].items()))
+    print(f"Time to ready over stdio, median of {args.runs}:")
+    print(f"  initialize answered  {ready['initialize_ms']:8.0f} ms")
+    print(f"  tools listed         {ready['list_tools_ms']:8.0f} ms")
+    print(f"  first call served    {ready['first_call_ms']:8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Measure what building one request's workflow costs: spliced template against deepcopy plus json.dumps
+
+The workflow is grown to the requested size by repeating its nodes with fresh ids and
+rewired links, so the graph is as deep and as wide as real large workflows. Both ways
+produce the same JSON, which is checked before timing.
+
+    python bench/bench_workflow.py --nodes 250 --calls 2000
+"""
+
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from comfy_mcp_server.workflow import (  # noqa: E402
+    SEED_INPUTS, WorkflowTemplate, find_input, find_prompt_input, load_graph,
+)
+
+DEFAULT_WORKFLOW = os.path.join(ROOT, "workflow", "image_z_image_turbo.json")
+
+
+def grow(graph: dict, nodes: int) -> dict:
+    """Repeat the graph's nodes under new ids until it has at least this many"""
+    offset = max(int(node_id) for node_id in graph) + 1
+    grown = dict(graph)
+    copies = 1
+    while len(grown) < nodes:
+        shift = offset * copies
+        for node_id, node in graph.items():
+            inputs = {
+                name: [str(int(value[0]) + shift), value[1]] if isinstance(value, list) else value
+                for name, value in node.get("inputs", {}).items()
+            }
+            grown[str(int(node_id) + shift)] = dict(node, inputs=inputs)
+        copies += 1
+    return grown
+
+
+def per_call(fn, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - started) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workflow", default=DEFAULT_WORKFLOW)
+    parser.add_argument("--nodes", type=lambda s: [int(n) for n in s.split(",")], default=[10, 250, 1000],
+                        help="comma separated workflow sizes")
+    parser.add_argument("--calls", type=int, default=2000, help="requests timed per size")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    rows = []
+    for nodes in args.nodes:
+        graph = grow(load_graph(args.workflow), nodes)
+        prompt_input = find_prompt_input(graph)
+        seed_input = find_input(graph, SEED_INPUTS)
+        points = [point for point in (prompt_input, seed_input) if point is not None]
+        template = WorkflowTemplate(graph, points)
+
+        def request_values() -> dict:
+            values = {prompt_input: f"a lighthouse on a cliff #{random.randrange(10 ** 6)}"}
+            if seed_input is not None:
+                values[seed_input] = random.randrange(2 ** 48)
+            return values
+
+        def deepcopy_dumps(values: dict) -> str:
+            # What the server did before the template: copy the graph, set the inputs, serialize it all
+            request = copy.deepcopy(graph)
+            for (node_id, name), value in values.items():
+                request[node_id]["inputs"][name] = value
+            return json.dumps(request)
+
+        values = request_values()
+        assert json.loads(template.render(values)) == json.loads(deepcopy_dumps(values))
+
+        spliced = per_call(lambda: template.render(request_values()), args.calls)
+        copied = per_call(lambda: deepcopy_dumps(request_values()), max(1, args.calls // 10))
+        rows.append({
+            "nodes": len(graph),
+            "json_kb": len(template.render()) / 1024,
+            "template_us": spliced * 1e6,
+            "deepcopy_dumps_us": copied * 1e6,
+            "speedup": copied / spliced,
+        })
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(" nodes  json KB  template us  deepcopy+dumps us  speedup")
+    for row in rows:
+        print(f"{row['nodes']:>6} {row['json_kb']:>8.1f} {row['template_us']:>12.1f}"
+              f" {row['deepcopy_dumps_us']:>18.1f} {row['speedup']:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
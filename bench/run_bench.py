@@ -0,0 +1,290 @@
+"""Benchmark the MCP server end to end against the stub ComfyUI and Ollama, no GPU or network needed
+
+Starts the stubs unless --comfy-url points at a running server, launches the MCP server
+from this checkout over stdio, and calls a tool at each concurrency level. It reports
+how long the server took to answer initialize, and for every level throughput, latency
+percentiles, the server's memory and what the ComfyUI stub was asked to do.
+
+    python bench/run_bench.py --concurrency 1,4,16 --requests 32 --latency 1
+    python bench/run_bench.py --tool generate_prompt --concurrency 1,8
+    python bench/run_bench.py --tool generate_images_from_topics --topics 8 --concurrency 1 --requests 4
+    python bench/run_bench.py --tool generate_image --call-timeout 0.5 --latency 2   # cancellation
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(ROOT, "bench")
+DEFAULT_WORKFLOW = os.path.join(ROOT, "workflow", "image_z_image_turbo.json")
+TOOLS = ("generate_image", "generate_images", "generate_prompt", "submit_image_job", "generate_images_from_topics")
+# Tools that need Ollama, for which the stub is started
+PROMPT_TOOLS = ("generate_prompt", "generate_images_from_topics")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(script: str, port: int, args: list[str]) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, script), "--port", str(port), *args])
+
+
+async def wait_until_up(url: str, timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url, timeout=1.0)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout:g} seconds")
+
+
+def server_memory() -> dict:
+    """Current and peak RSS of the MCP server, found among our child processes (Linux only)"""
+    parent = str(os.getpid())
+    for pid in filter(str.isdigit, os.listdir("/proc") if os.path.isdir("/proc") else []):
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                status = dict(line.split(":", 1) for line in f if ":" in line)
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmdline = f.read()
+        except OSError:
+            continue
+        if status.get("PPid", "").strip() == parent and b"comfy_mcp_server" in cmdline:
+            return {
+                "rss_mb": int(status["VmRSS"].split()[0]) / 1024,
+                "peak_rss_mb": int(status["VmHWM"].split()[0]) / 1024,
+            }
+    return {}
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+async def stub_stats(url: str | None) -> dict:
+    if url is None:
+        return {}
+    try:
+        async with httpx.AsyncClient() as client:
+            resp = await client.get(f"{url}/stats", timeout=2.0)
+            return resp.json() if resp.status_code == 200 else {}
+    except httpx.HTTPError:
+        return {}
+
+
+def succeeded(tool: str, result) -> bool:
+    if result.isError:
+        return False
+    texts = [item.text for item in result.content if item.type == "text"]
+    if tool == "generate_prompt":
+        return bool(texts) and bool(texts[0].strip()) and not texts[0].startswith("Failed")
+    return bool(texts) and all("generated successfully" in text for text in texts)
+
+
+async def call(session: ClientSession, args: argparse.Namespace, n: int):
+    prompt = args.prompt if args.repeat else f"{args.prompt} #{n}"
+    if args.tool == "generate_prompt":
+        return await session.call_tool("generate_prompt", {"topic": prompt})
+    options = {}
+    if args.call_timeout is not None:
+        options["timeout"] = args.call_timeout
+    if args.thumbnail:
+        options["thumbnail"] = True
+    if args.tool == "generate_images":
+        return await session.call_tool("generate_images", {"prompts": [f"{prompt} a", f"{prompt} b"], **options})
+    if args.tool == "generate_images_from_topics":
+        topics = [f"{prompt} {i}" for i in range(args.topics)]
+        return await session.call_tool("generate_images_from_topics", {"topics": topics, **options})
+    if args.tool == "submit_image_job":
+        options.pop("timeout", None)
+        submitted = await session.call_tool("submit_image_job", {"prompt": prompt, **options})
+        job_id = submitted.content[0].text.rsplit(": ", 1)[-1]
+        return await session.call_tool("wait_for_jobs", {"job_ids": [job_id], "timeout": args.wait_timeout})
+    return await session.call_tool("generate_image", {"prompt": prompt, **options})
+
+
+async def run_level(session: ClientSession, args: argparse.Namespace, concurrency: int, offset: int) -> dict:
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for n in range(args.requests):
+        queue.put_nowait(offset + n)
+
+    async def client():
+        nonlocal errors
+        while not queue.empty():
+            n = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                result = await call(session, args, n)
+                ok = succeeded(args.tool, result)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "calls": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 0.5),
+        "p90": percentile(latencies, 0.9),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "max": max(latencies) if latencies else None,
+    }
+
+
+def print_row(row: dict):
+    def ms(value):
+        return f"{value * 1000:8.0f}" if value is not None else "       -"
+
+    stub = row.get("stub", {})
+    print(f"{row['concurrency']:>4} {row['calls']:>6} {row['errors']:>6} {row['throughput']:>8.2f}"
+          f" {ms(row['p50'])} {ms(row['p90'])} {ms(row['p95'])} {ms(row['p99'])} {ms(row['max'])}"
+          f" {row.get('rss_mb', 0):>7.1f} {row.get('peak_rss_mb', 0):>7.1f}"
+          f" {stub.get('prompts', '-'):>7} {stub.get('interrupted', '-'):>5} {stub.get('deleted', '-'):>5}")
+
+
+async def run(args: argparse.Namespace):
+    processes = []
+    comfy_url = args.comfy_url
+    ollama_url = args.ollama_url
+    try:
+        if comfy_url is None:
+            port = free_port()
+            processes.append(start_stub("stub_comfyui.py", port, [
+                "--latency", str(args.latency), "--jitter", str(args.jitter), "--steps", str(args.steps),
+                "--failure-rate", str(args.failure_rate), "--workers", str(args.workers),
+                "--image-size", args.image_size, "--seed", "0",
+            ]))
+            comfy_url = f"http://127.0.0.1:{port}"
+        if ollama_url is None and args.tool in PROMPT_TOOLS:
+            port = free_port()
+            processes.append(start_stub("stub_ollama.py", port, [
+                "--latency", str(args.ollama_latency), "--token-delay", str(args.token_delay),
+            ]))
+            ollama_url = f"http://127.0.0.1:{port}"
+        await wait_until_up(f"{comfy_url}/queue")
+        if ollama_url is not None:
+            await wait_until_up(f"{ollama_url}/api/tags")
+
+        output_dir = tempfile.mkdtemp(prefix="comfy_mcp_bench_")
+        env = dict(
+            os.environ,
+            PYTHONPATH=os.pathsep.join(filter(None, [os.path.join(ROOT, "src"), os.environ.get("PYTHONPATH")])),
+            COMFY_URL=comfy_url,
+            COMFY_WORKFLOW_JSON_FILE=args.workflow,
+            COMFY_LOCAL_SAVE_DIR=output_dir,
+            COMFY_CACHE="true" if args.cache else "false",
+        )
+        if ollama_url is not None:
+            env.update(OLLAMA_API_BASE=ollama_url, PROMPT_LLM="stub")
+        for item in args.env:
+            key, _, value = item.partition("=")
+            env[key] = value
+
+        server = StdioServerParameters(command=sys.executable, args=["-m", "comfy_mcp_server"], env=env)
+        rows = []
+        started = time.perf_counter()
+        async with stdio_client(server) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                # From spawning the server to its answer; bench_startup.py breaks this down
+                ready = time.perf_counter() - started
+                if not args.json:
+                    print(f"{args.tool} against {comfy_url}, {args.requests} calls per level, images in {output_dir}")
+                    print(f"Server ready {ready * 1000:.0f} ms after it was started")
+                    if args.tool == "generate_images_from_topics":
+                        print(f"{args.topics} topics per call, latencies are end to end: prompts written and images rendered")
+                    print("conc  calls errors    req/s   p50 ms   p90 ms   p95 ms   p99 ms   max ms  rss MB peak MB"
+                          " prompts intr  del")
+                for i, concurrency in enumerate(args.concurrency):
+                    before = await stub_stats(comfy_url)
+                    row = await run_level(session, args, concurrency, i * args.requests)
+                    # Let cancellations reach the stub before counting them
+                    await asyncio.sleep(0.5)
+                    after = await stub_stats(comfy_url)
+                    row["stub"] = {key: after[key] - before.get(key, 0)
+                                   for key in ("prompts", "completed", "failed", "interrupted", "deleted")
+                                   if key in after}
+                    row.update(server_memory())
+                    rows.append(row)
+                    if not args.json:
+                        print_row(row)
+                stats = await session.call_tool("server_stats", {})
+        if args.json:
+            print(json.dumps({"ready_seconds": ready, "levels": rows,
+                              "server_stats": json.loads(stats.content[0].text)}, indent=2))
+        elif args.stages:
+            print(json.dumps(json.loads(stats.content[0].text)["stages"], indent=2))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tool", choices=TOOLS, default="generate_image")
+    parser.add_argument("--concurrency", type=lambda s: [int(n) for n in s.split(",")], default=[1, 4, 16],
+                        help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=16, help="calls per concurrency level")
+    parser.add_argument("--prompt", default="a lighthouse on a cliff at dusk")
+    parser.add_argument("--repeat", action="store_true", help="send the same prompt every call")
+    parser.add_argument("--topics", type=int, default=4, help="topics per generate_images_from_topics call")
+    parser.add_argument("--cache", action="store_true", help="leave the result cache on")
+    parser.add_argument("--thumbnail", action="store_true", help="ask for inline thumbnails")
+    parser.add_argument("--call-timeout", type=float, default=None, help="timeout argument for each call")
+    parser.add_argument("--wait-timeout", type=float, default=600, help="wait_for_jobs timeout")
+    parser.add_argument("--workflow", default=DEFAULT_WORKFLOW)
+    parser.add_argument("--env", action="append", default=[], help="extra KEY=VALUE for the MCP server")
+    parser.add_argument("--stages", action="store_true", help="print the server's stage timings at the end")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+
+    stub = parser.add_argument_group("stub ComfyUI, started unless --comfy-url is given")
+    stub.add_argument("--comfy-url", default=None)
+    stub.add_argument("--latency", type=float, default=1.0, help="seconds per render")
+    stub.add_argument("--jitter", type=float, default=0.1)
+    stub.add_argument("--steps", type=int, default=10)
+    stub.add_argument("--failure-rate", type=float, default=0.0)
+    stub.add_argument("--workers", type=int, default=1)
+    stub.add_argument("--image-size", default="1024x1024")
+
+    ollama = parser.add_argument_group("stub Ollama, started for the prompt tools unless --ollama-url is given")
+    ollama.add_argument("--ollama-url", default=None)
+    ollama.add_argument("--ollama-latency", type=float, default=0.3)
+    ollama.add_argument("--token-delay", type=float, default=0.01)
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""A stand-in for ComfyUI that renders nothing, for benchmarking the MCP server offline
+
+It accepts any API-format workflow and answers the endpoints the server uses: /prompt,
+/history, /view, /queue, /interrupt, /upload/image and the /ws event stream. Renders
+take a configurable time, run a configurable number at a time like ComfyUI's single
+worker, and can fail at random. /stats reports what was asked of it.
+
+    python bench/stub_comfyui.py --port 8188 --latency 2 --jitter 0.2 --failure-rate 0.05
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import random
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+import uvicorn
+from PIL import Image, ImageFilter
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocketDisconnect
+
+OUTPUT_CLASSES = ("SaveImage", "PreviewImage")
+
+
+def make_png(width: int, height: int) -> bytes:
+    """A blurred noise image, which compresses about as badly as a real render"""
+    noise = Image.effect_noise((width, height), 48).filter(ImageFilter.GaussianBlur(1))
+    gradient = Image.linear_gradient("L").resize((width, height))
+    image = Image.merge("RGB", (noise, gradient, noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class Job:
+    def __init__(self, number: int, prompt_id: str, client_id: str | None, workflow: dict):
+        self.number = number
+        self.prompt_id = prompt_id
+        self.client_id = client_id
+        self.workflow = workflow
+        self.interrupted = False
+
+    def output_nodes(self) -> list[str]:
+        return [node_id for node_id, node in self.workflow.items()
+                if isinstance(node, dict) and node.get("class_type") in OUTPUT_CLASSES]
+
+    def batch_size(self) -> int:
+        for node in self.workflow.values():
+            if isinstance(node, dict) and isinstance(node.get("inputs", {}).get("batch_size"), int):
+                return max(1, node["inputs"]["batch_size"])
+        return 1
+
+    def queue_entry(self) -> list:
+        return [self.number, self.prompt_id, self.workflow, {}, self.output_nodes()]
+
+
+class StubComfyUI:
+    def __init__(self, latency: float, jitter: float, steps: int, failure_rate: float,
+                 workers: int, width: int, height: int):
+        self.latency = latency
+        self.jitter = jitter
+        self.steps = max(1, steps)
+        self.failure_rate = failure_rate
+        self.workers = max(1, workers)
+        self.png = make_png(width, height)
+        self.pending = []
+        self.running = {}
+        self.history = {}
+        self.inputs = {}
+        self.sockets = {}
+        self.counter = 0
+        self.wakeup = asyncio.Event()
+        self.stats = {
+            "prompts": 0, "completed": 0, "failed": 0, "interrupted": 0, "deleted": 0,
+            "history_requests": 0, "view_requests": 0, "queue_requests": 0, "uploads": 0,
+        }
+
+    async def send(self, client_id: str | None, kind: str, data: dict):
+        websocket = self.sockets.get(client_id)
+        if websocket is None:
+            return
+        try:
+            await websocket.send_text(json.dumps({"type": kind, "data": data}))
+        except Exception:
+            self.sockets.pop(client_id, None)
+
+    def finish(self, job: Job, completed: bool, status: str, messages: list, outputs: dict):
+        self.history[job.prompt_id] = {
+            "prompt": job.queue_entry(),
+            "outputs": outputs,
+            "status": {"status_str": status, "completed": completed, "messages": messages},
+        }
+
+    async def render(self, job: Job):
+        pid = job.prompt_id
+        started = time.time()
+        messages = [["execution_start", {"prompt_id": pid, "timestamp": int(started * 1000)}]]
+        await self.send(job.client_id, "execution_start", {"prompt_id": pid})
+        await self.send(job.client_id, "executing", {"node": "sampler", "prompt_id": pid})
+
+        duration = max(0.0, self.latency * random.uniform(1 - self.jitter, 1 + self.jitter))
+        for step in range(1, self.steps + 1):
+            await asyncio.sleep(duration / self.steps)
+            if job.interrupted:
+                break
+            await self.send(job.client_id, "progress",
+                            {"value": step, "max": self.steps, "prompt_id": pid, "node": "sampler"})
+
+        if job.interrupted:
+            self.stats["interrupted"] += 1
+            messages.append(["execution_interrupted", {"prompt_id": pid, "timestamp": int(time.time() * 1000)}])
+            self.finish(job, False, "error", messages, {})
+            await self.send(job.client_id, "execution_interrupted", {"prompt_id": pid})
+            return
+        if random.random() < self.failure_rate:
+            self.stats["failed"] += 1
+            messages.append(["execution_error", {"prompt_id": pid, "timestamp": int(time.time() * 1000)}])
+            self.finish(job, False, "error", messages, {})
+            await self.send(job.client_id, "execution_error",
+                            {"prompt_id": pid, "exception_message": "Simulated failure"})
+            return
+
+        outputs = {}
+        for node_id in job.output_nodes():
+            images = [{"filename": f"stub_{job.number:05}_{i:02}_.png", "subfolder": "", "type": "output"}
+                      for i in range(job.batch_size())]
+            outputs[node_id] = {"images": images}
+            await self.send(job.client_id, "executed", {"node": node_id, "output": outputs[node_id], "prompt_id": pid})
+        self.stats["completed"] += 1
+        messages.append(["execution_success", {"prompt_id": pid, "timestamp": int(time.time() * 1000)}])
+        self.finish(job, True, "success", messages, outputs)
+        await self.send(job.client_id, "executing", {"node": None, "prompt_id": pid})
+        await self.send(job.client_id, "execution_success", {"prompt_id": pid})
+
+    async def worker(self):
+        while True:
+            while not self.pending:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+            job = self.pending.pop(0)
+            self.running[job.prompt_id] = job
+            try:
+                await self.render(job)
+            finally:
+                del self.running[job.prompt_id]
+
+    # HTTP endpoints
+
+    async def post_prompt(self, request):
+        body = json.loads(await request.body())
+        workflow = body.get("prompt")
+        if not isinstance(workflow, dict) or not workflow:
+            return JSONResponse({"error": {"type": "prompt_no_outputs", "message": "Prompt has no outputs"}},
+                                status_code=400)
+        self.counter += 1
+        self.stats["prompts"] += 1
+        job = Job(self.counter, str(uuid.uuid4()), body.get("client_id"), workflow)
+        self.pending.append(job)
+        self.wakeup.set()
+        return JSONResponse({"prompt_id": job.prompt_id, "number": job.number, "node_errors": {}})
+
+    async def get_history(self, request):
+        self.stats["history_requests"] += 1
+        prompt_id = request.path_params.get("prompt_id")
+        if prompt_id is None:
+            return JSONResponse(self.history)
+        return JSONResponse({prompt_id: self.history[prompt_id]} if prompt_id in self.history else {})
+
+    async def view(self, request):
+        self.stats["view_requests"] += 1
+        if request.query_params.get("type") == "input":
+            data = self.inputs.get(request.query_params.get("filename"))
+            if data is None:
+                return Response(status_code=404)
+            return Response(data, media_type="image/png")
+        return Response(self.png, media_type="image/png")
+
+    async def queue(self, request):
+        if request.method == "POST":
+            body = await request.json()
+            if body.get("clear"):
+                self.stats["deleted"] += len(self.pending)
+                self.pending.clear()
+            ids = set(body.get("delete", []))
+            kept = [job for job in self.pending if job.prompt_id not in ids]
+            self.stats["deleted"] += len(self.pending) - len(kept)
+            self.pending[:] = kept
+            return Response(status_code=200)
+        self.stats["queue_requests"] += 1
+        return JSONResponse({
+            "queue_running": [job.queue_entry() for job in self.running.values()],
+            "queue_pending": [job.queue_entry() for job in self.pending],
+        })
+
+    async def interrupt(self, request):
+        try:
+            body = await request.json()
+        except ValueError:
+            body = {}
+        prompt_id = body.get("prompt_id") if isinstance(body, dict) else None
+        for job in self.running.values():
+            if prompt_id is None or job.prompt_id == prompt_id:
+                job.interrupted = True
+        return Response(status_code=200)
+
+    async def upload_image(self, request):
+        form = await request.form()
+        upload = form["image"]
+        self.inputs[upload.filename] = await upload.read()
+        self.stats["uploads"] += 1
+        return JSONResponse({"name": upload.filename, "subfolder": "", "type": "input"})
+
+    async def get_stats(self, request):
+        return JSONResponse(dict(self.stats, pending=len(self.pending), running=len(self.running)))
+
+    async def websocket(self, websocket):
+        client_id = websocket.query_params.get("clientId") or uuid.uuid4().hex
+        await websocket.accept()
+        self.sockets[client_id] = websocket
+        await websocket.send_text(json.dumps({"type": "status", "data": {"sid": client_id}}))
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            if self.sockets.get(client_id) is websocket:
+                del self.sockets[client_id]
+
+    def app(self) -> Starlette:
+        @asynccontextmanager
+        async def lifespan(app):
+            workers = [asyncio.get_running_loop().create_task(self.worker()) for _ in range(self.workers)]
+            yield
+            for task in workers:
+                task.cancel()
+
+        return Starlette(routes=[
+            Route("/prompt", self.post_prompt, methods=["POST"]),
+            Route("/history", self.get_history),
+            Route("/history/{prompt_id}", self.get_history),
+            Route("/view", self.view, methods=["GET", "HEAD"]),
+            Route("/queue", self.queue, methods=["GET", "POST"]),
+            Route("/interrupt", self.interrupt, methods=["POST"]),
+            Route("/upload/image", self.upload_image, methods=["POST"]),
+            Route("/stats", self.get_stats),
+            WebSocketRoute("/ws", self.websocket),
+        ], lifespan=lifespan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8188)
+    parser.add_argument("--latency", type=float, default=2.0, help="seconds per render")
+    parser.add_argument("--jitter", type=float, default=0.1, help="render time varies by up to this fraction")
+    parser.add_argument("--steps", type=int, default=10, help="progress events per render")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of renders that fail")
+    parser.add_argument("--workers", type=int, default=1, help="renders running at once")
+    parser.add_argument("--image-size", default="1024x1024", help="output image WIDTHxHEIGHT")
+    parser.add_argument("--seed", type=int, default=None, help="seed for jitter and failures")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    width, height = (int(n) for n in args.image_size.lower().split("x"))
+    stub = StubComfyUI(args.latency, args.jitter, args.steps, args.failure_rate, args.workers, width, height)
+    uvicorn.run(stub.app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
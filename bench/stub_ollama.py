@@ -0,0 +1,87 @@
+"""A stand-in for Ollama's chat API that streams a canned prompt, for benchmarking offline
+
+    python bench/stub_ollama.py --port 11434 --latency 0.5 --token-delay 0.02
+"""
+
+import argparse
+import asyncio
+import json
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+TEMPLATE = ("a highly detailed cinematic photograph of {topic}, dramatic lighting, shallow depth of field, "
+            "rich colors, sharp focus, 35mm film grain, masterpiece")
+
+
+class StubOllama:
+    def __init__(self, latency: float, token_delay: float):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.requests = 0
+
+    def chunk(self, model: str, content: str, done: bool) -> str:
+        message = {
+            "model": model,
+            "created_at": "2025-01-01T00:00:00Z",
+            "message": {"role": "assistant", "content": content},
+            "done": done,
+        }
+        if done:
+            message.update(done_reason="stop", total_duration=1, load_duration=1, prompt_eval_count=1,
+                           prompt_eval_duration=1, eval_count=1, eval_duration=1)
+        return json.dumps(message) + "\n"
+
+    async def chat(self, request):
+        self.requests += 1
+        body = await request.json()
+        model = body.get("model", "stub")
+        lines = body["messages"][-1]["content"].strip().splitlines()
+        # The server's template ends with "Topic: ..." then "Prompt:", other callers may send the bare topic
+        topic = next((line.strip()[len("Topic:"):].strip() for line in lines if line.strip().startswith("Topic:")),
+                     lines[-1])[:80]
+        words = TEMPLATE.format(topic=topic).split(" ")
+
+        async def stream():
+            # Time to first token, as when Ollama evaluates the prompt
+            await asyncio.sleep(self.latency)
+            for i, word in enumerate(words):
+                await asyncio.sleep(self.token_delay)
+                yield self.chunk(model, word if i == 0 else " " + word, False)
+            yield self.chunk(model, "", True)
+
+        if body.get("stream", True):
+            return StreamingResponse(stream(), media_type="application/x-ndjson")
+        await asyncio.sleep(self.latency + self.token_delay * len(words))
+        return JSONResponse(json.loads(self.chunk(model, " ".join(words), True)))
+
+    async def tags(self, request):
+        return JSONResponse({"models": [{"name": "stub:latest", "model": "stub:latest"}]})
+
+    async def stats(self, request):
+        return JSONResponse({"requests": self.requests})
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/api/chat", self.chat, methods=["POST"]),
+            Route("/api/tags", self.tags),
+            Route("/stats", self.stats),
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between tokens")
+    args = parser.parse_args()
+
+    uvicorn.run(StubOllama(args.latency, args.token_delay).app(), host=args.host, port=args.port,
+                log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import os
 import json
+import shlex
 import subprocess
 import sys
 
@@ -62,13 +63,33 @@ class MCPConfigGenerator:
                 "auto_update_claude_code": ("BOOLEAN", {"default": False}),
                 "auto_update_claude_desktop": ("BOOLEAN", {"default": False}),
                 "auto_update_gemini_cli": ("BOOLEAN", {"default": False}),
+            },
+            "optional": {
+                # stdio starts one server per client; the HTTP transports share one running server
+                "transport": (["stdio", "streamable-http", "sse"],),
+                "server_host": ("STRING", {
+                    "default": "127.0.0.1",
+                    "multiline": False
+                }),
+                "server_port": ("INT", {
+                    "default": 8765,
+                    "min": 1,
+                    "max": 65535,
+                    "step": 1
+                }),
+                # The only folder upload_image may read by path; a shared server needs it to take paths at all
+                "upload_dir": ("STRING", {
+                    "default": "",
+                    "multiline": False
+                }),
             }
         }
 
     def generate_config(self, workflow_file, prompt_node_id, output_node_id,
                        comfy_url, max_poll_attempts, poll_interval, output_mode,
                        config_format, auto_install, auto_update_claude_code,
-                       auto_update_claude_desktop, auto_update_gemini_cli):
+                       auto_update_claude_desktop, auto_update_gemini_cli,
+                       transport="stdio", server_host="127.0.0.1", server_port=8765, upload_dir=""):
         """
         Generate MCP config, update config files, auto-install module, auto-update AI configs
         """
@@ -118,34 +139,58 @@ class MCPConfigGenerator:
             "COMFY_URL": comfy_url,
             "COMFY_URL_EXTERNAL": comfy_url,
             "COMFY_WORKFLOW_JSON_FILE": workflow_path,
+            "COMFY_WORKFLOW_DIR": os.path.join(node_dir, "workflow"),
             "PROMPT_NODE_ID": str(prompt_node_id),
             "OUTPUT_NODE_ID": str(output_node_id),
             "OUTPUT_MODE": output_mode,
             "COMFY_MAX_POLL_ATTEMPTS": str(max_poll_attempts),
             "COMFY_POLL_INTERVAL": str(poll_interval)
         }
+        if upload_dir:
+            mcp_env_config["COMFY_UPLOAD_DIR"] = os.path.abspath(upload_dir)
+
+        # Client entries: stdio clients start their own server, HTTP clients connect to a shared one
+        stdio_config = {
+            "command": python_exe,
+            "args": ["-m", "comfy_mcp_server"],
+            "cwd": node_dir,
+            "env": mcp_env_config
+        }
+        server_url = None
+        if transport == "stdio":
+            claude_code_config = stdio_config
+            claude_desktop_config = stdio_config
+            gemini_config = {
+                "command": python_exe,
+                "args": ["-m", "comfy_mcp_server"],
+                "env": mcp_env_config
+            }
+        else:
+            mcp_env_config["COMFY_MCP_TRANSPORT"] = transport
+            mcp_env_config["COMFY_MCP_HOST"] = server_host
+            mcp_env_config["COMFY_MCP_PORT"] = str(server_port)
+            # A server listening on every interface is still reached through localhost here
+            url_host = "127.0.0.1" if server_host in ("", "0.0.0.0", "::") else server_host
+            if url_host != server_host:
+                warnings.append(f"⚠ The MCP server will accept connections from other machines on port {server_port}")
+            server_url = f"http://{url_host}:{server_port}{'/sse' if transport == 'sse' else '/mcp'}"
+
+            claude_code_config = {"type": "http" if transport == "streamable-http" else "sse", "url": server_url}
+            # Claude Desktop's config file only starts stdio servers, mcp-remote bridges to the URL
+            claude_desktop_config = {"command": "npx", "args": ["-y", "mcp-remote", server_url]}
+            gemini_config = {"httpUrl" if transport == "streamable-http" else "url": server_url}
 
         # Generate configuration based on format
         if config_format == "ClaudeDesktop":
             mcp_config = {
                 "mcpServers": {
-                    "comfyui-image-generator": {
-                        "command": python_exe,
-                        "args": ["-m", "comfy_mcp_server"],
-                        "cwd": node_dir,
-                        "env": mcp_env_config
-                    }
+                    "comfyui-image-generator": claude_desktop_config
                 }
             }
         else:  # Gemini
             mcp_config = {
                 "mcp_servers": {
-                    "comfyui-image-generator": {
-                        "command": python_exe,
-                        "args": ["-m", "comfy_mcp_server"],
-                        "cwd": node_dir,
-                        "env": mcp_env_config
-                    }
+                    "comfyui-image-generator": stdio_config if server_url is None else gemini_config
                 }
             }
 
@@ -155,13 +200,6 @@ class MCPConfigGenerator:
             status_messages.append("Auto-Update: Claude Code (User Scope)")
             status_messages.append("=" * 50)
 
-            claude_code_config = {
-                "command": python_exe,
-                "args": ["-m", "comfy_mcp_server"],
-                "cwd": node_dir,
-                "env": mcp_env_config
-            }
-
             result = self._update_claude_code(claude_code_config)
             status_messages.append(result)
             status_messages.append("")
@@ -171,13 +209,6 @@ class MCPConfigGenerator:
             status_messages.append("Auto-Update: Claude Desktop")
             status_messages.append("=" * 50)
 
-            claude_desktop_config = {
-                "command": python_exe,
-                "args": ["-m", "comfy_mcp_server"],
-                "cwd": node_dir,
-                "env": mcp_env_config
-            }
-
             result = self._update_claude_desktop(claude_desktop_config)
             status_messages.append(result)
             status_messages.append("")
@@ -187,15 +218,7 @@ class MCPConfigGenerator:
             status_messages.append("Auto-Update: Gemini CLI")
             status_messages.append("=" * 50)
 
-            gemini_config = {
-                "command": python_exe,
-                "args": ["-m", "comfy_mcp_server"],
-                "env": mcp_env_config,
-                "timeout": 120000,
-                "trust": False
-            }
-
-            result = self._update_gemini_cli(gemini_config)
+            result = self._update_gemini_cli(dict(gemini_config, timeout=120000, trust=False))
             status_messages.append(result)
             status_messages.append("")
 
@@ -230,10 +253,24 @@ class MCPConfigGenerator:
                     f.write(f"OUTPUT_MODE={output_mode}\n")
                     f.write(f"MAX_POLL_ATTEMPTS={max_poll_attempts}\n")
                     f.write(f"POLL_INTERVAL={poll_interval}\n")
+                    f.write(f"TRANSPORT={transport}\n")
+                    if server_url is not None:
+                        f.write(f"SERVER_URL={server_url}\n")
                 status_messages.append("✓ mcp_config.ini updated")
             except Exception as e:
                 status_messages.append(f"⚠ Failed to update mcp_config.ini: {e}")
 
+            # HTTP clients need the shared server running, started from this script
+            if server_url is not None:
+                launcher_name = "start_mcp_server.bat" if sys.platform == "win32" else "start_mcp_server.sh"
+                launcher_path = os.path.join(node_dir, launcher_name)
+                try:
+                    self._write_launcher(launcher_path, python_exe, node_dir, mcp_env_config)
+                    status_messages.append(f"✓ {os.path.basename(launcher_path)} generated")
+                    status_messages.append(f"  Run it before connecting clients, it serves {server_url}")
+                except Exception as e:
+                    status_messages.append(f"⚠ Failed to write {launcher_path}: {e}")
+
             # 5. Check MCP status
             status_messages.append("")
             status_messages.append("=" * 50)
@@ -254,6 +291,9 @@ class MCPConfigGenerator:
             status_messages.append(f"ComfyUI URL: {comfy_url}")
             status_messages.append(f"Output Mode: {output_mode}")
             status_messages.append(f"Config Format: {config_format}")
+            status_messages.append(f"Transport: {transport}")
+            if server_url is not None:
+                status_messages.append(f"Server URL: {server_url}")
             status_messages.append(f"Auto Install: {'Yes' if auto_install else 'No'}")
             status_messages.append(f"Auto Update Claude Code: {'Yes' if auto_update_claude_code else 'No'}")
             status_messages.append(f"Auto Update Claude Desktop: {'Yes' if auto_update_claude_desktop else 'No'}")
@@ -268,6 +308,8 @@ class MCPConfigGenerator:
                 status_messages.append("Merge generated JSON content to:")
                 status_messages.append("Windows: %APPDATA%\\Claude\\claude_desktop_config.json")
                 status_messages.append("macOS: ~/Library/Application Support/Claude/claude_desktop_config.json")
+                if server_url is not None:
+                    status_messages.append("Connecting to the shared server through mcp-remote needs Node.js (npx)")
             else:  # Gemini
                 status_messages.append("")
                 status_messages.append("=" * 50)
@@ -332,6 +374,26 @@ class MCPConfigGenerator:
         except Exception as e:
             return f"✗ Error during installation: {str(e)}"
 
+    def _write_launcher(self, path, python_exe, node_dir, env):
+        """Write a script that starts the shared HTTP server with the generated settings
+
+        A batch file on Windows, a shell script elsewhere.
+        """
+        if sys.platform != "win32":
+            lines = ["#!/bin/sh", f"cd {shlex.quote(node_dir)}"]
+            lines += [f"export {key}={shlex.quote(value)}" for key, value in env.items()]
+            lines.append(f"exec {shlex.quote(python_exe)} -m comfy_mcp_server")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+            os.chmod(path, 0o755)
+            return
+        lines = ["@echo off", f'cd /d "{node_dir}"']
+        # %% keeps cmd from expanding a literal percent sign
+        lines += [f'set "{key}={value.replace("%", "%%")}"' for key, value in env.items()]
+        lines.append(f'"{python_exe}" -m comfy_mcp_server')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("\r\n".join(lines) + "\r\n")
+
     def _update_claude_code(self, config):
         """Auto-update Claude Code MCP configuration (User Scope)"""
         try:
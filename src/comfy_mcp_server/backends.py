@@ -0,0 +1,137 @@
+import asyncio
+import logging
+from contextlib import contextmanager
+
+from .client import ComfyClient
+from .polling import RenderTimes
+
+logger = logging.getLogger(__name__)
+
+
+class Backend:
+    """One ComfyUI server plus the live load figures used to route jobs to it"""
+
+    def __init__(self, client: ComfyClient):
+        self.client = client
+        self.healthy = True
+        self.last_error = None
+        # Prompts queued on the server by anyone, as of the last health check
+        self.queue_depth = 0
+        # Jobs this process has routed here and not finished yet
+        self.in_flight = 0
+        self.completed = 0
+
+    @property
+    def name(self) -> str:
+        return self.client.server
+
+    def expected_wait(self, per_job: float) -> float:
+        # The queue count lags behind our own submissions until the next health check
+        return (max(self.queue_depth, self.in_flight) + 1) * per_job
+
+
+class BackendPool:
+    """Routes each job to the least loaded healthy ComfyUI server
+
+    Render times come from the same estimator polling uses, keyed on (backend name, workflow).
+    """
+
+    def __init__(self, backends: list[Backend], health_interval: float = 10.0,
+                 default_render_time: float = 10.0, render_times: RenderTimes | None = None):
+        self.backends = backends
+        self.health_interval = health_interval
+        self.default_render_time = default_render_time
+        self.render_times = render_times if render_times is not None else RenderTimes()
+        self._checked = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        for backend in self.backends:
+            backend.client.start()
+        if self._task is None and self.health_interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._health_loop())
+        elif self.health_interval <= 0:
+            self._checked.set()
+
+    async def ready(self, timeout: float):
+        """Wait for the first round of health checks, so dead backends aren't picked at start-up"""
+        try:
+            await asyncio.wait_for(self._checked.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for backend in self.backends:
+            await backend.client.close()
+
+    def render_times_of(self, backend: Backend) -> dict[str, float]:
+        return {workflow: seconds for (server, workflow), seconds in self.render_times.known().items()
+                if server == backend.name}
+
+    def render_time(self, backend: Backend, workflow: str | None = None) -> float:
+        """Expected seconds per job: this workflow's if it ran there, else the backend's average"""
+        seconds = self.render_times.expected((backend.name, workflow))
+        if seconds is not None:
+            return seconds
+        known = self.render_times_of(backend)
+        return sum(known.values()) / len(known) if known else self.default_render_time
+
+    def ranked(self, workflow: str | None = None) -> list[Backend]:
+        """Backends in routing order: healthy ones by expected wait, then the rest as a last resort"""
+        return sorted(
+            self.backends,
+            key=lambda b: (not b.healthy, b.expected_wait(self.render_time(b, workflow)), b.in_flight),
+        )
+
+    @contextmanager
+    def track(self, backend: Backend):
+        """Count a job against a backend while it runs there"""
+        backend.in_flight += 1
+        try:
+            yield
+        finally:
+            backend.in_flight -= 1
+
+    def mark_failed(self, backend: Backend, error: Exception):
+        if backend.healthy:
+            logger.warning(f"Taking ComfyUI backend {backend.name} out of rotation: {error}")
+        backend.healthy = False
+        backend.last_error = str(error)
+
+    async def check(self, backend: Backend):
+        try:
+            queue = await backend.client.queue()
+        except Exception as e:
+            self.mark_failed(backend, e)
+            return
+        if queue is None:
+            self.mark_failed(backend, RuntimeError("/queue request failed"))
+            return
+        if not backend.healthy:
+            logger.warning(f"ComfyUI backend {backend.name} is back in rotation")
+        backend.healthy = True
+        backend.last_error = None
+        backend.queue_depth = len(queue.get("queue_running", [])) + len(queue.get("queue_pending", []))
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.gather(*[self.check(backend) for backend in self.backends])
+            self._checked.set()
+            await asyncio.sleep(self.health_interval)
+
+    def stats(self) -> list[dict]:
+        return [
+            {
+                "server": backend.name,
+                "healthy": backend.healthy,
+                "last_error": backend.last_error,
+                "queue_depth": backend.queue_depth,
+                "in_flight": backend.in_flight,
+                "render_times": self.render_times_of(backend),
+                "completed": backend.completed,
+            }
+            for backend in self.backends
+        ]
@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import time
+
+from .locking import file_lock
+
+logger = logging.getLogger(__name__)
+
+
+def workflow_key(workflow: str, output_node_id: str, variant: str = "") -> str:
+    """Content address of a render: the effective workflow graph, the node we read back
+    and how the result was stored locally"""
+    digest = hashlib.sha256(workflow.encode('utf-8'))
+    digest.update(b"\0" + output_node_id.encode('utf-8'))
+    digest.update(b"\0" + variant.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Persistent LRU cache of finished renders, keyed on the effective workflow
+
+    Each entry keeps its own link (or copy) of the saved image inside the cache
+    directory, so evicting it never deletes the file handed back to the caller.
+    Hits don't touch the disk: the recency they record is saved along with the next
+    change to the index. Changes are made under a file lock on top of a fresh read of
+    the index, since every stdio server on the machine shares the directory.
+    """
+
+    # Files the cache links in are named after their key
+    FILE_NAME = re.compile(r"[0-9a-f]{64}_\d+(\.\w+)?")
+
+    def __init__(self, directory: str, max_bytes: int, max_age: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._index_path = os.path.join(directory, "index.json")
+        self._lock_path = os.path.join(directory, "index.lock")
+        self._entries = None
+        # Hits since the index was last written, merged into it as recency
+        self._used = {}
+
+    @property
+    def entries(self) -> dict:
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    def _read(self) -> dict:
+        try:
+            with open(self._index_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _stale(self, entry: dict) -> bool:
+        expired = time.time() - entry["created"] > self.max_age
+        return expired or any(
+            image["file"] is not None and not os.path.exists(os.path.join(self.directory, image["file"]))
+            for image in entry["images"])
+
+    def get(self, key: str) -> list[dict] | None:
+        """Return the cached images of a render, each with a local_path that exists (or None)"""
+        entry = self.entries.get(key)
+        if entry is not None and self._stale(entry):
+            with file_lock(self._lock_path):
+                self._merge()
+                # Another process may have stored it again meanwhile
+                entry = self.entries.get(key)
+                if entry is not None and self._stale(entry):
+                    self._remove(key)
+                    entry = None
+                self._save()
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        # Only kept in memory; the index is written with it on the next put or eviction
+        entry["last_used"] = self._used[key] = time.time()
+        images = []
+        for image in entry["images"]:
+            # Prefer the caller's original file while it still exists
+            local_path = image["source"]
+            if local_path is not None and not os.path.exists(local_path):
+                local_path = os.path.abspath(os.path.join(self.directory, image["file"]))
+            images.append(dict(image, local_path=local_path))
+        return images
+
+    def put(self, key: str, images: list[dict]):
+        """Store a finished render; each image needs a local_path (or None) plus any info to hand back"""
+        with file_lock(self._lock_path):
+            self._merge()
+            self._put(key, images)
+
+    def _put(self, key: str, images: list[dict]):
+        stored = []
+        for i, image in enumerate(images):
+            local_path = image["local_path"]
+            info = {k: v for k, v in image.items() if k != "local_path"}
+            if local_path is None:
+                # Nothing was saved locally, only the remote details are kept
+                stored.append(dict(info, file=None, source=None, size=0))
+                continue
+            filename = f"{key}_{i}{os.path.splitext(local_path)[1]}"
+            path = os.path.join(self.directory, filename)
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+                try:
+                    os.link(local_path, path)
+                except OSError:
+                    shutil.copyfile(local_path, path)
+            except OSError as e:
+                logger.warning(f"Could not cache {local_path}: {e}")
+                return
+            stored.append(dict(
+                info, file=filename, source=os.path.abspath(local_path), size=os.path.getsize(path)))
+
+        now = time.time()
+        self.entries[key] = {
+            "images": stored,
+            "size": sum(image["size"] for image in stored),
+            "created": now,
+            "last_used": now,
+        }
+        self._evict()
+        self._sweep()
+        self._save()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "bytes": sum(entry["size"] for entry in self.entries.values()),
+            "max_bytes": self.max_bytes,
+        }
+
+    def _evict(self):
+        now = time.time()
+        for key in [k for k, e in self.entries.items() if now - e["created"] > self.max_age]:
+            self._remove(key)
+        total = sum(entry["size"] for entry in self.entries.values())
+        for key in sorted(self.entries, key=lambda k: self.entries[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            total -= self.entries[key]["size"]
+            self._remove(key)
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key)
+        self.evictions += 1
+        for image in entry["images"]:
+            if image["file"] is None:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, image["file"]))
+            except OSError:
+                pass
+
+    def _merge(self):
+        """Reload the index others may have changed, keeping this process's hits; call under the lock"""
+        merged = self._read()
+        for key, last_used in self._used.items():
+            if key in merged:
+                merged[key]["last_used"] = max(merged[key]["last_used"], last_used)
+        self._used.clear()
+        self._entries = merged
+
+    def _sweep(self):
+        """Delete cached files no entry refers to, such as those of an index update that was lost"""
+        referenced = {image["file"] for entry in self.entries.values() for image in entry["images"]}
+        for name in os.listdir(self.directory):
+            if name not in referenced and self.FILE_NAME.fullmatch(name):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def _save(self):
+        tmp_path = self._index_path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self._index_path)
+        except OSError as e:
+            logger.warning(f"Could not write cache index: {e}")
+
+
+class InFlightRenders:
+    """Renders under way, keyed like the result cache, so identical concurrent requests share one
+
+    The first request for a key leads: it renders and settles the future with what it
+    saved. Requests arriving meanwhile wait on that future instead of queueing the same
+    render again. A leader that is cancelled cancels its future, and a waiter takes over.
+    If its prompt was already submitted, the leader hands it over rather than cancelling
+    it in ComfyUI, and the new leader waits for that prompt instead of submitting again.
+    """
+
+    def __init__(self):
+        self.renders = {}
+        self.joined = 0
+        # How many requests wait on each render
+        self.waiting = {}
+        # Submitted prompts a cancelled leader left for the next one, as (server, prompt_id)
+        self.handed_over = {}
+
+    def get(self, key: str) -> asyncio.Future | None:
+        return self.renders.get(key)
+
+    def lead(self, key: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.renders[key] = future
+        return future
+
+    def finish(self, key: str, future: asyncio.Future):
+        if not future.done():
+            future.cancel()
+        if self.renders.get(key) is future:
+            del self.renders[key]
+
+    def join(self, key: str):
+        self.waiting[key] = self.waiting.get(key, 0) + 1
+
+    def leave(self, key: str):
+        self.waiting[key] -= 1
+        if not self.waiting[key]:
+            del self.waiting[key]
+
+    def hand_over(self, key: str, server: str, prompt_id: str) -> bool:
+        """Leave a cancelled leader's submitted prompt to whoever leads next, if anyone is waiting"""
+        if not self.waiting.get(key):
+            return False
+        self.handed_over[key] = (server, prompt_id)
+        return True
+
+    def take_over(self, key: str) -> tuple[str, str] | None:
+        return self.handed_over.pop(key, None)
+
+    def stats(self) -> dict:
+        # Each request that joined another's render is one render ComfyUI didn't have to do
+        return {"in_flight": len(self.renders), "waiting": sum(self.waiting.values()), "renders_saved": self.joined}
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import random
+import urllib.parse
+from dataclasses import dataclass
+
+import httpx
+
+from .listener import ComfyEventListener
+from .metrics import Metrics
+
+
+# Gateway errors in front of ComfyUI are usually a restart or an overloaded proxy
+RETRY_STATUS_CODES = (502, 503, 504)
+
+
+def get_file_url(server: str, url_values: str) -> str:
+    return f"{server}/view?{url_values}"
+
+
+@dataclass(frozen=True)
+class HttpOptions:
+    """Connection pool, timeout and retry settings for talking to one ComfyUI server"""
+
+    max_connections: int = 10
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 5.0
+    timeout: float = 30.0
+    retries: int = 3
+    # First retry waits up to this long, doubling after every failed attempt
+    backoff: float = 0.5
+
+
+class ComfyClient:
+    """Async client for one ComfyUI server, sharing pooled connections across all jobs"""
+
+    def __init__(self, server: str, external_server: str | None = None,
+                 client_id: str | None = None, use_websocket: bool = True,
+                 options: HttpOptions = HttpOptions(), metrics: Metrics | None = None):
+        self.server = server
+        self.options = options
+        self.metrics = metrics
+        self.external_server = external_server or server
+        self.client_id = client_id
+        self.listener = (
+            ComfyEventListener(server, client_id)
+            if use_websocket and client_id is not None else None
+        )
+        self._http = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        # Created on first use so it binds to the event loop the server runs on
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.server,
+                timeout=httpx.Timeout(self.options.timeout, connect=self.options.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.options.max_connections,
+                    max_keepalive_connections=self.options.max_connections,
+                    keepalive_expiry=self.options.keepalive_expiry,
+                ),
+            )
+        return self._http
+
+    def _count(self, name: str):
+        if self.metrics is not None:
+            self.metrics.count(name, self.server)
+
+    async def _backoff(self, attempt: int):
+        self._count("retries")
+        # Full jitter keeps many jobs from retrying in lockstep
+        await asyncio.sleep(random.uniform(0, self.options.backoff * 2 ** attempt))
+
+    async def request(self, method: str, url: str, idempotent: bool = True, **kwargs) -> httpx.Response:
+        """Send a request on the shared pool, retrying transient failures with backoff
+
+        Requests that are not idempotent are only retried when they never reached the
+        server, so a prompt is never queued twice.
+        """
+        for attempt in range(self.options.retries + 1):
+            last_attempt = attempt == self.options.retries
+            try:
+                resp = await self.http.request(method, url, **kwargs)
+                if last_attempt or not idempotent or resp.status_code not in RETRY_STATUS_CODES:
+                    return resp
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                if isinstance(e, httpx.TimeoutException):
+                    self._count("timeouts")
+                if last_attempt:
+                    raise
+            except httpx.TransportError as e:
+                if isinstance(e, httpx.TimeoutException):
+                    self._count("timeouts")
+                if last_attempt or not idempotent:
+                    raise
+            await self._backoff(attempt)
+
+    def start(self):
+        if self.listener is not None:
+            self.listener.start()
+
+    async def close(self):
+        if self.listener is not None:
+            await self.listener.stop()
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def submit(self, workflow: str) -> str | None:
+        """Queue a workflow given as JSON text and return its prompt id"""
+        body = '{"prompt": ' + workflow
+        if self.client_id is not None:
+            body += ', "client_id": ' + json.dumps(self.client_id)
+        body += '}'
+        resp = await self.request("POST", "/prompt", idempotent=False, content=body.encode('utf-8'))
+        if resp.status_code != 200:
+            return None
+        return resp.json()["prompt_id"]
+
+    async def history(self, prompt_id: str) -> dict | None:
+        resp = await self.request("GET", f"/history/{prompt_id}")
+        if resp.status_code == 200:
+            history = resp.json()
+            if prompt_id in history:
+                return history[prompt_id]
+        return None
+
+    async def queue(self, timeout: float = 5.0) -> dict | None:
+        """Fetch the running and pending queue; used for health checks, so it never retries"""
+        resp = await self.http.get("/queue", timeout=timeout)
+        if resp.status_code == 200:
+            return resp.json()
+        return None
+
+    async def delete(self, prompt_ids: list[str]) -> bool:
+        """Drop prompts that are still waiting in the queue; running ones are left alone"""
+        resp = await self.request("POST", "/queue", json={"delete": prompt_ids})
+        return resp.status_code == 200
+
+    async def interrupt(self, prompt_id: str) -> bool:
+        """Stop the running prompt; ComfyUI versions that know the id only stop that one"""
+        resp = await self.request("POST", "/interrupt", json={"prompt_id": prompt_id})
+        return resp.status_code == 200
+
+    async def upload_image(self, path: str, name: str) -> str | None:
+        """Upload a file to ComfyUI's input folder under name and return the name it was stored as"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        # Names are content hashes, so overwriting is harmless and retrying can't create duplicates
+        resp = await self.request("POST", "/upload/image", files={"image": (name, data)},
+                                  data={"overwrite": "true", "type": "input"})
+        if resp.status_code != 200:
+            return None
+        return resp.json().get("name")
+
+    async def has_input(self, name: str) -> bool:
+        resp = await self.request("HEAD", "/view", params={"filename": name, "type": "input"})
+        return resp.status_code == 200
+
+    async def download(self, output: dict, path: str, chunk_size: int = 64 * 1024) -> int | None:
+        """Stream an output image to path in chunks and return its size in bytes"""
+        for attempt in range(self.options.retries + 1):
+            last_attempt = attempt == self.options.retries
+            try:
+                async with self.http.stream("GET", "/view", params=output) as resp:
+                    if resp.status_code == 200:
+                        # A retry starts the file over, so a broken transfer never leaves a partial image
+                        size = 0
+                        with open(path, 'wb') as f:
+                            async for chunk in resp.aiter_bytes(chunk_size):
+                                f.write(chunk)
+                                size += len(chunk)
+                        return size
+                    if last_attempt or resp.status_code not in RETRY_STATUS_CODES:
+                        return None
+            except httpx.TransportError as e:
+                if isinstance(e, httpx.TimeoutException):
+                    self._count("timeouts")
+                if last_attempt:
+                    raise
+            await self._backoff(attempt)
+
+    def file_url(self, output: dict) -> str:
+        return get_file_url(self.external_server, urllib.parse.urlencode(output))
@@ -0,0 +1,168 @@
+import asyncio
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+IMAGE_FORMATS = ("webp", "png")
+# Every MCP client can show JPEG, and at thumbnail sizes it's the cheapest to encode
+THUMBNAIL_MIME_TYPE = "image/jpeg"
+THUMBNAIL_QUALITIES = (85, 70, 55, 40)
+
+
+@dataclass(frozen=True)
+class EncodeOptions:
+    """How a downloaded PNG is stored locally"""
+
+    format: str = "webp"
+    quality: int = 85
+    # Pillow's WebP method: 0 is fastest, 6 is slowest with the smallest files
+    method: int = 6
+    lossless: bool = False
+    # Longest side of an inline preview returned with the result, 0 for none
+    thumbnail: int = 0
+    thumbnail_bytes: int = 64 * 1024
+
+    def cache_tag(self) -> str:
+        if self.format == "png":
+            return "png"
+        return f"webp:{self.quality}:{self.method}:{int(self.lossless)}"
+
+
+def encode_thumbnail(image, max_size: int, max_bytes: int) -> bytes:
+    """Shrink a decoded image to fit max_size pixels and, lowering quality first, max_bytes"""
+    thumb = image.convert("RGB")
+    thumb.thumbnail((max_size, max_size))
+    while True:
+        for quality in THUMBNAIL_QUALITIES:
+            buffer = io.BytesIO()
+            thumb.save(buffer, format="JPEG", quality=quality, optimize=True)
+            if buffer.tell() <= max_bytes:
+                return buffer.getvalue()
+        if min(thumb.size) <= 16:
+            # Can't get under the budget, the smallest try is still better than nothing
+            return buffer.getvalue()
+        thumb = thumb.resize((max(1, thumb.width * 3 // 4), max(1, thumb.height * 3 // 4)))
+
+
+def thumbnail_file(path: str, max_size: int, max_bytes: int) -> bytes:
+    from PIL import Image
+
+    with Image.open(path) as image:
+        return encode_thumbnail(image, max_size, max_bytes)
+
+
+def save_image(source_path: str, basename: str,
+               options: EncodeOptions) -> tuple[str, str | None, bytes | None, dict]:
+    """Turn a downloaded PNG into basename.webp, or keep the PNG as is
+
+    The source file is consumed either way. Falls back to keeping the PNG if conversion
+    fails. If options ask for a thumbnail it's made from the same decoded image and
+    returned as JPEG bytes, followed by how long each step took. Runs in worker
+    processes, so it must stay a picklable top-level function.
+    """
+
+    timings = {}
+    thumbnail = None
+    if options.format == "webp":
+        try:
+            from PIL import Image
+
+            local_path = f"{basename}.webp"
+            started = time.perf_counter()
+            with Image.open(source_path) as png_image:
+                png_image.load()
+                timings["decode"] = time.perf_counter() - started
+                # Encoded in memory first, so encoding and the disk write are timed apart
+                started = time.perf_counter()
+                buffer = io.BytesIO()
+                png_image.save(buffer, format='WebP', quality=options.quality,
+                               method=options.method, lossless=options.lossless)
+                timings["encode"] = time.perf_counter() - started
+                if options.thumbnail > 0:
+                    started = time.perf_counter()
+                    thumbnail = encode_thumbnail(png_image, options.thumbnail, options.thumbnail_bytes)
+                    timings["thumbnail"] = time.perf_counter() - started
+            started = time.perf_counter()
+            with open(local_path, "wb") as f:
+                f.write(buffer.getbuffer())
+            os.remove(source_path)
+            timings["write"] = time.perf_counter() - started
+            return local_path, None, thumbnail, timings
+        except Exception as e:
+            error = str(e)
+    else:
+        error = None
+
+    local_path = f"{basename}.png"
+    os.replace(source_path, local_path)
+    if options.thumbnail > 0:
+        try:
+            started = time.perf_counter()
+            thumbnail = thumbnail_file(local_path, options.thumbnail, options.thumbnail_bytes)
+            timings["thumbnail"] = time.perf_counter() - started
+        except Exception:
+            pass
+    return local_path, error, thumbnail, timings
+
+
+class ImageEncoder:
+    """Runs image encoding in a process pool so large WebP saves use every core"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool = None
+        self._warmed = False
+
+    def _get_pool(self) -> ProcessPoolExecutor | None:
+        if self.workers <= 0:
+            return None
+        if self._pool is None:
+            # Spawned workers don't inherit the server's event loop, sockets or locks
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def warm(self):
+        """Start the workers early, so the first save doesn't pay for their start-up"""
+        pool = self._get_pool()
+        if pool is not None and not self._warmed:
+            self._warmed = True
+            for _ in range(self.workers):
+                pool.submit(os.getpid)
+
+    async def _run(self, func, *args):
+        pool = self._get_pool()
+        if pool is not None:
+            try:
+                return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+            except BrokenProcessPool:
+                # A worker died; start a fresh pool next time and encode this one in a thread
+                self._pool = None
+                self._warmed = False
+        return await asyncio.to_thread(func, *args)
+
+    async def save(self, source_path: str, basename: str,
+                   options: EncodeOptions) -> tuple[str, str | None, bytes | None, dict]:
+        # Only the path crosses the process boundary, never the full-size image
+        return await self._run(save_image, source_path, basename, options)
+
+    async def thumbnail(self, path: str, options: EncodeOptions) -> bytes | None:
+        """Make the inline preview of an image already on disk, e.g. one served from the cache"""
+        try:
+            return await self._run(thumbnail_file, path, options.thumbnail, options.thumbnail_bytes)
+        except Exception:
+            return None
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._warmed = False
+
+
+def default_workers() -> int:
+    return min(4, os.cpu_count() or 1)
@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import time
+import uuid
+
+from .locking import ProcessLock, file_lock
+
+logger = logging.getLogger(__name__)
+
+# Job states in the order a job moves through them; the last three are final
+QUEUED = "queued"
+SUBMITTED = "submitted"
+RENDERED = "rendered"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+class JobJournal:
+    """Append-only log of every job's state, so renders outlive the server process
+
+    Each line holds the fields that changed for one job; replaying the file rebuilds
+    the latest state. Without a path the journal only lives in memory.
+
+    Every stdio client starts its own server, and they all share the file. Each job
+    names the process that looks after it, which holds a lock file for as long as it
+    runs; only jobs whose owner has gone are taken over. Lines are appended, and the
+    file compacted, under a lock on the journal.
+    """
+
+    def __init__(self, path: str | None, max_age: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_age = max_age
+        self.owner = uuid.uuid4().hex
+        self.jobs = {}
+        # Jobs taken over from a process that is gone, whose ComfyUI events went to it
+        self.adopted = set()
+        self._owner_lock = None
+        if self.path is None:
+            return
+        self._lock_path = f"{self.path}.lock"
+        self._owners_dir = f"{os.path.splitext(self.path)[0]}.owners"
+        try:
+            with file_lock(self._lock_path):
+                self._owner_lock = ProcessLock(self._owner_path(self.owner))
+                lines = self._load()
+                # Rewrite the file when most of it is superseded or expired lines, unless
+                # another process may still append to it
+                if lines > 2 * len(self.jobs) + 100 and not self._running_owners():
+                    self._compact()
+        except OSError as e:
+            logger.warning(f"Could not open job journal {self.path}: {e}")
+
+    def _owner_path(self, owner: str) -> str:
+        return os.path.join(self._owners_dir, f"{owner}.lock")
+
+    def _running_owners(self) -> set[str]:
+        """Other processes sharing the journal that are still running; call under the lock"""
+        running = set()
+        for name in os.listdir(self._owners_dir):
+            owner = os.path.splitext(name)[0]
+            if owner == self.owner:
+                continue
+            if ProcessLock.held(self._owner_path(owner)):
+                running.add(owner)
+            else:
+                # Nobody takes a lock file without holding the journal's lock, so this is no race
+                try:
+                    os.remove(self._owner_path(owner))
+                except OSError:
+                    pass
+        return running
+
+    def running(self, owner: str | None) -> bool:
+        """Whether the process that owns a job is still running"""
+        if owner == self.owner:
+            return True
+        return owner is not None and self.path is not None and ProcessLock.held(self._owner_path(owner))
+
+    def _load(self) -> int:
+        if self.path is None or not os.path.exists(self.path):
+            return 0
+        lines = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash mid-write
+                    continue
+                self.jobs.setdefault(entry.pop("id"), {}).update(entry)
+
+        cutoff = time.time() - self.max_age
+        for job_id, job in list(self.jobs.items()):
+            if job.get("updated", 0) < cutoff:
+                del self.jobs[job_id]
+        return lines
+
+    def refresh(self):
+        """Catch up with what other processes wrote since the journal was read"""
+        try:
+            self._load()
+        except OSError as e:
+            logger.warning(f"Could not read job journal {self.path}: {e}")
+
+    def _compact(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for job_id, job in self.jobs.items():
+                f.write(json.dumps(dict(job, id=job_id)) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def _append(self, job_id: str, fields: dict):
+        """Write one job's changes to the file; call under the lock"""
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(dict(fields, id=job_id)) + "\n")
+
+    def record(self, job_id: str, **fields):
+        fields["updated"] = time.time()
+        if job_id not in self.jobs:
+            fields.setdefault("owner", self.owner)
+        self.jobs.setdefault(job_id, {}).update(fields)
+        if self.path is None:
+            return
+        try:
+            with file_lock(self._lock_path):
+                self._append(job_id, fields)
+        except OSError as e:
+            logger.warning(f"Could not write job journal {self.path}: {e}")
+
+    def claim(self, job_ids=None) -> list[str]:
+        """Take over the unfinished jobs, of those given or all of them, whose owner has gone"""
+        if self.path is None:
+            return []
+        claimed = []
+        try:
+            with file_lock(self._lock_path):
+                # Another process may have taken them over since the journal was read
+                self._load()
+                for job_id in (self.jobs if job_ids is None else job_ids):
+                    job = self.jobs.get(job_id)
+                    if job is None or job["status"] in FINAL_STATES or self.running(job.get("owner")):
+                        continue
+                    fields = {"owner": self.owner, "updated": time.time()}
+                    job.update(fields)
+                    self._append(job_id, fields)
+                    self.adopted.add(job_id)
+                    claimed.append(job_id)
+        except OSError as e:
+            logger.warning(f"Could not take over jobs in {self.path}: {e}")
+        return claimed
+
+    def owns(self, job_id: str) -> bool:
+        """Whether this process looks after a job, taking it over if its owner has gone"""
+        return self.jobs[job_id].get("owner") == self.owner or job_id in self.claim([job_id])
+
+    def close(self):
+        if self._owner_lock is not None:
+            self._owner_lock.release()
+            self._owner_lock = None
+
+    def get(self, job_id: str) -> dict | None:
+        return self.jobs.get(job_id)
+
+    def recent(self, limit: int = 20, session: str | None = None) -> list[tuple[str, dict]]:
+        """The newest jobs started by one client session, None being the only client of a stdio server
+
+        Jobs of other servers still running are left out, as they belong to other clients.
+        """
+        owners = {}
+        jobs = []
+        for job_id, job in self.jobs.items():
+            if job.get("session") != session:
+                continue
+            owner = job.get("owner")
+            if owner not in owners:
+                owners[owner] = owner != self.owner and self.running(owner)
+            if not owners[owner]:
+                jobs.append((job_id, job))
+        return sorted(jobs, key=lambda item: item[1].get("created", 0), reverse=True)[:limit]
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Keep state for at most this many prompts that nobody has collected yet
+MAX_TRACKED_PROMPTS = 1024
+
+
+def get_ws_url(server: str, client_id: str) -> str:
+    if server.startswith("https://"):
+        server = "wss://" + server[len("https://"):]
+    elif server.startswith("http://"):
+        server = "ws://" + server[len("http://"):]
+    return f"{server}/ws?clientId={client_id}"
+
+
+class PromptState:
+    """Execution state of one prompt as reported over the websocket"""
+
+    def __init__(self):
+        self.done = asyncio.Event()
+        self.outputs = {}
+        self.error = None
+        # Set once ComfyUI starts executing the prompt, i.e. it left the queue
+        self.started = False
+        self.started_at = None
+        # Latest sampler progress as (node, value, max)
+        self.progress = None
+
+
+class ComfyEventListener:
+    """Shared websocket connection to ComfyUI that wakes up jobs waiting on a prompt"""
+
+    def __init__(self, server: str, client_id: str, reconnect_delay: float = 2.0):
+        self.url = get_ws_url(server, client_id)
+        self.reconnect_delay = reconnect_delay
+        # Incremented on every successful connect, so waiters can tell they may have missed events
+        self.generation = 0
+        self._connected = asyncio.Event()
+        self._states = OrderedDict()
+        self._task = None
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._connected.clear()
+
+    async def wait_connected(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def state(self, prompt_id: str) -> PromptState:
+        state = self._states.get(prompt_id)
+        if state is None:
+            state = self._states[prompt_id] = PromptState()
+            while len(self._states) > MAX_TRACKED_PROMPTS:
+                self._states.popitem(last=False)
+        return state
+
+    def peek(self, prompt_id: str) -> PromptState | None:
+        """The state of a prompt someone is waiting on, without starting to track it"""
+        return self._states.get(prompt_id)
+
+    def forget(self, prompt_id: str):
+        self._states.pop(prompt_id, None)
+
+    async def wait(self, prompt_id: str, timeout: float) -> bool:
+        """Wait until the prompt finished executing or the timeout expires"""
+        try:
+            await asyncio.wait_for(self.state(prompt_id).done.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _run(self):
+        from websockets.asyncio.client import connect
+
+        while True:
+            try:
+                async with connect(self.url, open_timeout=10, max_size=None) as ws:
+                    self.generation += 1
+                    self._connected.set()
+                    async for message in ws:
+                        # Binary frames carry live previews, which we don't use
+                        if isinstance(message, str):
+                            self._dispatch(json.loads(message))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.debug(f"ComfyUI websocket unavailable: {e}")
+            finally:
+                self._connected.clear()
+            await asyncio.sleep(self.reconnect_delay)
+
+    @staticmethod
+    def _mark_started(state: PromptState):
+        if not state.started:
+            state.started = True
+            state.started_at = time.time()
+
+    def _dispatch(self, message: dict):
+        kind = message.get("type")
+        data = message.get("data") or {}
+        prompt_id = data.get("prompt_id")
+        if prompt_id is None:
+            return
+
+        if kind == "executed":
+            self.state(prompt_id).outputs[data["node"]] = data.get("output") or {}
+        elif kind == "progress":
+            state = self.state(prompt_id)
+            self._mark_started(state)
+            state.progress = (data.get("node"), data.get("value", 0), data.get("max", 0))
+        elif kind == "execution_start" or (kind == "executing" and data.get("node") is not None):
+            self._mark_started(self.state(prompt_id))
+        elif kind == "executing":
+            self.state(prompt_id).done.set()
+        elif kind == "execution_success":
+            self.state(prompt_id).done.set()
+        elif kind in ("execution_error", "execution_interrupted"):
+            state = self.state(prompt_id)
+            state.error = data.get("exception_message") or kind
+            state.done.set()
@@ -0,0 +1,75 @@
+import os
+from contextlib import contextmanager
+
+
+def _lock(f, blocking: bool = True) -> bool:
+    """Lock an open file exclusively, returning False if it is held elsewhere and blocking is off"""
+    try:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            # LK_LOCK retries for about 10 seconds before raising OSError
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        if blocking:
+            raise
+        return False
+    return True
+
+
+def _unlock(f):
+    if os.name == "nt":
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive lock on path, created if needed, against other processes
+
+    Every stdio client starts its own server, and they all share COMFY_LOCAL_SAVE_DIR,
+    so the indexes kept there are only read and rewritten under this lock.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a+b") as f:
+        _lock(f)
+        try:
+            yield
+        finally:
+            _unlock(f)
+
+
+class ProcessLock:
+    """A lock file held for as long as this process runs, so others can tell whether it still does"""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._file = open(path, "a+b")
+        _lock(self._file)
+
+    def release(self):
+        if self._file is not None:
+            _unlock(self._file)
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def held(path: str) -> bool:
+        """Whether the process that took the lock at path is still running"""
+        try:
+            f = open(path, "r+b")
+        except OSError:
+            return False
+        with f:
+            if not _lock(f, blocking=False):
+                return True
+            _unlock(f)
+            return False
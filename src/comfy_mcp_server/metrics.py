@@ -0,0 +1,138 @@
+import json
+import logging
+import math
+import os
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from a fast disk write to a slow video render
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, math.inf)
+
+
+class Histogram:
+    """Durations counted into fixed buckets, so memory stays flat however many jobs run"""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float | None:
+        """Estimate a quantile by interpolating inside the bucket it falls in"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                upper = min(bound, self.max)
+                return lower + (upper - lower) * max(0.0, rank - seen) / count
+            seen += count
+            lower = bound
+        return self.max
+
+    def stats(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "max": self.max if self.count else None,
+        }
+
+
+class Metrics:
+    """Timing histograms per stage of a job and error counters per backend
+
+    With a JSONL path, every timing is also kept as a line and appended to the file on
+    each flush, for looking at individual jobs after the fact.
+    """
+
+    def __init__(self, jsonl_path: str | None = None):
+        self.jsonl_path = jsonl_path
+        self.histograms = {}
+        self.counters = {}
+        self._lines = []
+
+    def observe(self, stage: str, seconds: float, backend: str | None = None):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = Histogram()
+        histogram.observe(seconds)
+        if self.jsonl_path is not None:
+            line = {"time": time.time(), "stage": stage, "seconds": round(seconds, 6)}
+            if backend is not None:
+                line["backend"] = backend
+            self._lines.append(json.dumps(line))
+
+    @contextmanager
+    def span(self, stage: str, backend: str | None = None):
+        """Time a block, recording it whether it finishes or fails"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, backend)
+
+    def count(self, name: str, backend: str, n: int = 1):
+        key = (name, backend)
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def backend_counters(self, backend: str) -> dict:
+        return {name: value for (name, server), value in self.counters.items() if server == backend}
+
+    def stats(self) -> dict:
+        return {stage: histogram.stats() for stage, histogram in sorted(self.histograms.items())}
+
+    def flush(self):
+        if self.jsonl_path is None or not self._lines:
+            return
+        lines, self._lines = self._lines, []
+        try:
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {self.jsonl_path}: {e}")
+
+    def prometheus(self, prefix: str = "comfy_mcp") -> str:
+        """Render everything in the Prometheus text exposition format"""
+        lines = [f"# TYPE {prefix}_stage_seconds histogram"]
+        for stage, histogram in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else f"{bound:g}"
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram.total:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        for name in sorted({name for name, _ in self.counters}):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            for (counter, backend), value in sorted(self.counters.items()):
+                if counter == name:
+                    lines.append(f'{prefix}_{name}_total{{backend="{backend}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Replace a text file for node_exporter's textfile collector, never leaving it half written"""
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.prometheus())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {path}: {e}")
@@ -0,0 +1,98 @@
+import time
+
+# Weight of the newest render time in the running average
+RENDER_TIME_SMOOTHING = 0.3
+# Share of the expected render time slept through before polling gets frequent
+EARLY_FRACTION = 0.9
+
+
+def message_time(history: dict, message: str) -> float | None:
+    """Wall-clock time of one of the status messages ComfyUI keeps in a prompt's history"""
+    for name, data in history.get('status', {}).get('messages', []):
+        if name == message and "timestamp" in data:
+            return data["timestamp"] / 1000
+    return None
+
+
+def finished_at(history: dict) -> float | None:
+    return message_time(history, "execution_success")
+
+
+def started_at(history: dict) -> float | None:
+    return message_time(history, "execution_start")
+
+
+class RenderTimes:
+    """Running average of how long a job takes from submit to finish, per key
+
+    The server keys it on (backend name, workflow); polling sleeps through the expected
+    time and the backend pool routes by it.
+    """
+
+    def __init__(self):
+        self._times = {}
+
+    def expected(self, key) -> float | None:
+        return self._times.get(key)
+
+    def known(self) -> dict:
+        return dict(self._times)
+
+    def record(self, key, seconds: float):
+        current = self._times.get(key)
+        if current is None:
+            self._times[key] = seconds
+        else:
+            self._times[key] = current + RENDER_TIME_SMOOTHING * (seconds - current)
+
+
+class PollSchedule:
+    """Sleep lengths for polling one job: sleep through most of the expected render, then back off"""
+
+    def __init__(self, expected: float | None, min_interval: float, max_interval: float,
+                 backoff: float = 2.0):
+        self.expected = expected
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.backoff = backoff
+        self.started = time.monotonic()
+        self.polls = 0
+        self._interval = min_interval
+
+    def next_delay(self) -> float:
+        elapsed = time.monotonic() - self.started
+        if self.expected is not None and elapsed < self.expected * EARLY_FRACTION:
+            # In one go: queue position updates don't need history polls, they come from /queue
+            return max(self.min_interval, self.expected * EARLY_FRACTION - elapsed)
+        delay = self._interval
+        self._interval = min(self.max_interval, self._interval * self.backoff)
+        return delay
+
+
+class PollStats:
+    """How many history polls jobs needed, and how late polling noticed that they were done"""
+
+    def __init__(self):
+        self.jobs = 0
+        self.polls = 0
+        self.lag_samples = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+
+    def record(self, polls: int, finished: float | None = None):
+        self.jobs += 1
+        self.polls += polls
+        if finished is not None:
+            lag = max(0.0, time.time() - finished)
+            self.lag_samples += 1
+            self.lag_total += lag
+            self.lag_max = max(self.lag_max, lag)
+
+    def stats(self) -> dict:
+        return {
+            "polled_jobs": self.jobs,
+            "polls": self.polls,
+            "polls_per_job": self.polls / self.jobs if self.jobs else 0.0,
+            "mean_detection_lag": self.lag_total / self.lag_samples if self.lag_samples else None,
+            "max_detection_lag": self.lag_max if self.lag_samples else None,
+        }
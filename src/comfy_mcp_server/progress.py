@@ -0,0 +1,58 @@
+import time
+
+from mcp.server.fastmcp import Context
+
+
+def queue_position(queue: dict, prompt_id: str) -> int | None:
+    """Place of a prompt in ComfyUI's /queue answer: 0 while running, 1 when next, None if absent"""
+    # Queue items are [number, prompt_id, prompt, extra_data, outputs_to_execute]
+    if any(item[1] == prompt_id for item in queue.get("queue_running", [])):
+        return 0
+    pending = sorted(queue.get("queue_pending", []), key=lambda item: item[0])
+    for position, item in enumerate(pending, start=1):
+        if item[1] == prompt_id:
+            return position
+    return None
+
+
+class ProgressReporter:
+    """Sends MCP progress notifications for one render, at most one every `interval` seconds
+
+    Sampler steps are counted across nodes, so a workflow with several samplers still
+    reports progress that only ever goes up.
+    """
+
+    def __init__(self, ctx: Context, interval: float, label: str = ""):
+        self.ctx = ctx
+        self.interval = interval
+        self.label = label
+        self._sent_at = None
+        self._message = None
+        self._node = None
+        self._base = 0
+        self._progress = 0
+        self._max = 0
+
+    def due(self) -> bool:
+        return self._sent_at is None or time.monotonic() - self._sent_at >= self.interval
+
+    async def _send(self, progress: float, total: float | None, message: str):
+        if message == self._message or not self.due():
+            return
+        self._sent_at = time.monotonic()
+        self._message = message
+        await self.ctx.report_progress(progress, total, f"{self.label}{message}")
+
+    async def queued(self, position: int | None):
+        if position:
+            await self._send(self._progress, None, f"Waiting in ComfyUI queue, position {position}")
+
+    async def step(self, node: str, value: int, maximum: int):
+        if node != self._node:
+            # A new sampler started, keep the steps of the previous ones
+            if self._node is not None:
+                self._base += self._max
+            self._node = node
+        self._max = maximum
+        self._progress = self._base + value
+        await self._send(self._progress, self._base + maximum, f"Rendering, step {value}/{maximum}")
@@ -0,0 +1,78 @@
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+PROMPT_TEMPLATE = """You are an AI Image Generation Prompt Assistant.
+        Your job is to review the topic provided by the user for an image generation task and create
+        an appropriate prompt from it. Repond with a single prompt. Don't ask for feedback about the prompt.
+
+        Topic: {topic}
+        Prompt: """
+
+
+class PromptWriter:
+    """Expands topics into image prompts through one long-lived Ollama chain
+
+    Answers are kept in an LRU keyed on model and topic, so asking again is free.
+    """
+
+    def __init__(self, base_url: str, model: str, cache_size: int = 256):
+        self.base_url = base_url
+        self.model = model
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._chain = None
+        self._cache = OrderedDict()
+
+    @property
+    def chain(self):
+        if self._chain is None:
+            # Imported here since langchain takes about a second to load and most servers never get this far
+            from langchain_ollama.chat_models import ChatOllama
+            from langchain_core.prompts import PromptTemplate
+            from langchain_core.output_parsers import StrOutputParser
+
+            model = ChatOllama(base_url=self.base_url, model=self.model)
+            prompt = PromptTemplate.from_template(PROMPT_TEMPLATE)
+            self._chain = prompt | model | StrOutputParser()
+        return self._chain
+
+    def cached(self, topic: str) -> str | None:
+        key = (self.model, topic)
+        response = self._cache.get(key)
+        if response is not None:
+            self._cache.move_to_end(key)
+        return response
+
+    async def write(self, topic: str,
+                    on_token: Callable[[str, int], Awaitable[None]] | None = None) -> str:
+        """Return a prompt for the topic, streaming partial text to on_token if given"""
+        response = self.cached(topic)
+        if response is not None:
+            self.hits += 1
+            return response
+        self.misses += 1
+
+        if on_token is None:
+            response = await self.chain.ainvoke({"topic": topic})
+        else:
+            response = ""
+            count = 0
+            async for token in self.chain.astream({"topic": topic}):
+                response += token
+                count += 1
+                await on_token(response, count)
+
+        if self.cache_size > 0:
+            self._cache[(self.model, topic)] = response
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return response
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model,
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._cache),
+        }
@@ -0,0 +1,108 @@
+import logging
+import os
+import time
+
+from .workflow import CompiledWorkflow, compile_workflow
+
+logger = logging.getLogger(__name__)
+
+
+def workflow_name(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+class WorkflowRegistry:
+    """Every workflow JSON in a directory, compiled once and recompiled when its file changes
+
+    Files are checked by modification time and size when a workflow is looked up, at
+    most once every check_interval seconds, so edits show up without a restart and
+    unchanged workflows are never parsed again. A negative interval turns this off.
+    """
+
+    def __init__(self, directory: str | None, default_path: str | None = None,
+                 prompt_node_id: str | None = None, output_node_id: str | None = None,
+                 check_interval: float = 2.0):
+        self.directory = directory
+        self.default_path = default_path
+        self.default_name = workflow_name(default_path) if default_path is not None else None
+        # Explicit node ids only apply to the default workflow, the others are detected
+        self.prompt_node_id = prompt_node_id
+        self.output_node_id = output_node_id
+        self.check_interval = check_interval
+        self._workflows = {}
+        self._errors = {}
+        self._checked = None
+        self.refresh()
+
+    def _paths(self) -> dict[str, str]:
+        paths = {}
+        if self.directory is not None and os.path.isdir(self.directory):
+            for entry in sorted(os.scandir(self.directory), key=lambda e: e.name):
+                if entry.name.endswith(".json") and entry.is_file():
+                    paths[workflow_name(entry.name)] = entry.path
+        if self.default_path is not None:
+            paths[self.default_name] = self.default_path
+        return paths
+
+    def refresh(self):
+        """Compile new or changed workflow files and drop deleted ones"""
+        self._checked = time.monotonic()
+        paths = self._paths()
+
+        for name in list(self._workflows):
+            if name not in paths:
+                logger.warning(f"Workflow {name} was removed")
+                del self._workflows[name]
+        for name in list(self._errors):
+            if name not in paths:
+                del self._errors[name]
+
+        for name, path in paths.items():
+            try:
+                stat = os.stat(path)
+            except OSError as e:
+                self._errors[name] = (None, str(e))
+                continue
+            signature = (path, stat.st_mtime_ns, stat.st_size)
+            current = self._workflows.get(name)
+            if current is not None and current[0] == signature:
+                continue
+            # A broken file is only retried once it changes again
+            if name in self._errors and self._errors[name][0] == signature:
+                continue
+
+            if name == self.default_name:
+                node_ids = (self.prompt_node_id, self.output_node_id)
+            else:
+                node_ids = (None, None)
+            try:
+                compiled = compile_workflow(name, path, *node_ids)
+            except Exception as e:
+                # Keep serving the last good version until the file is fixed
+                logger.warning(f"Could not load workflow {path}: {e}")
+                self._errors[name] = (signature, str(e))
+                continue
+            self._errors.pop(name, None)
+            self._workflows[name] = (signature, compiled)
+
+    def _maybe_refresh(self):
+        if self.check_interval >= 0 and time.monotonic() - self._checked >= self.check_interval:
+            self.refresh()
+
+    def get(self, name: str | None = None) -> CompiledWorkflow | None:
+        """Look up a workflow by name, or the default one"""
+        self._maybe_refresh()
+        if name is None:
+            name = self.default_name if self.default_name in self._workflows else next(iter(sorted(self._workflows)), None)
+        entry = self._workflows.get(name)
+        return entry[1] if entry is not None else None
+
+    def names(self) -> list[str]:
+        self._maybe_refresh()
+        return sorted(self._workflows)
+
+    def workflows(self) -> list[CompiledWorkflow]:
+        return [self._workflows[name][1] for name in self.names()]
+
+    def errors(self) -> dict[str, str]:
+        return {name: error for name, (_, error) in self._errors.items()}
@@ -0,0 +1,58 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+
+
+class SchedulerBusy(Exception):
+    """Raised when too many jobs are already waiting for a slot"""
+
+
+class JobScheduler:
+    """Limits how many prompts are in flight in ComfyUI, admitting waiting jobs in FIFO order"""
+
+    def __init__(self, max_in_flight: int, max_waiting: int):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_waiting = max(0, max_waiting)
+        self.in_flight = 0
+        self._waiters = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self):
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_waiting:
+            raise SchedulerBusy(
+                f"{self.in_flight} jobs running and {len(self._waiters)} waiting")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we got cancelled, pass it on
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self):
+        # Hand the slot straight to the oldest waiter so nobody can jump the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
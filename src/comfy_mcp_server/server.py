@@ -0,0 +1,1405 @@
+from mcp.server.fastmcp import FastMCP, Context
+from mcp.types import ImageContent, TextContent
+import asyncio
+import base64
+import binascii
+import json
+import os
+import random
+import time
+import uuid
+import sys
+import warnings
+from dataclasses import asdict
+from datetime import datetime
+
+import anyio
+import httpx
+
+# Suppress warnings to avoid polluting MCP stdout
+warnings.filterwarnings("ignore")
+
+# Ensure all logging goes to stderr, not stdout
+import logging
+logging.basicConfig(stream=sys.stderr, level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+from .backends import Backend, BackendPool
+from .client import ComfyClient, HttpOptions
+from .scheduler import JobScheduler, SchedulerBusy
+from .cache import InFlightRenders, ResultCache, workflow_key
+from .prompts import PromptWriter
+from .progress import ProgressReporter, queue_position
+from .polling import PollSchedule, PollStats, RenderTimes, finished_at, started_at
+from .metrics import Metrics
+from .encoding import IMAGE_FORMATS, THUMBNAIL_MIME_TYPE, EncodeOptions, ImageEncoder, default_workers
+from .registry import WorkflowRegistry
+from .uploads import InputImages
+from .jobs import CANCELLED, DONE, FAILED, QUEUED, RENDERED, SUBMITTED, JobJournal, new_job_id
+from .transports import run_http, run_stdio
+from .workflow import CompiledWorkflow
+
+# "streamable-http" or "sse" serve every client from one long-running process instead of one per client
+mcp_transport = os.environ.get("COMFY_MCP_TRANSPORT", "stdio").lower()
+mcp_host = os.environ.get("COMFY_MCP_HOST", "127.0.0.1")
+mcp_port = int(os.environ.get("COMFY_MCP_PORT", "8765"))  # Default port 8765
+
+mcp = FastMCP("Comfy MCP Server", host=mcp_host, port=mcp_port)
+
+# Both accept a comma separated list; external URLs are matched to backends by position
+host = os.environ.get("COMFY_URL")
+override_host = os.environ.get("COMFY_URL_EXTERNAL")
+if override_host is None:
+    override_host = host
+hosts = [h.strip().rstrip("/") for h in host.split(",") if h.strip()] if host is not None else []
+override_hosts = [h.strip().rstrip("/") for h in override_host.split(",")] if override_host is not None else []
+workflow = os.environ.get("COMFY_WORKFLOW_JSON_FILE")
+# Every workflow JSON in this folder can be picked per call; COMFY_WORKFLOW_JSON_FILE stays the default
+workflow_dir = os.environ.get("COMFY_WORKFLOW_DIR")
+
+# Only needed when detection by class_type picks the wrong nodes of the default workflow
+prompt_node_id = os.environ.get("PROMPT_NODE_ID")
+output_node_id = os.environ.get("OUTPUT_NODE_ID")
+# "url" returns only the ComfyUI URL and never downloads the image
+output_mode = os.environ.get("OUTPUT_MODE")
+
+# Compiled once; each request splices its prompt, seed and batch size into a pre-serialized copy.
+# Changed files are recompiled on the next lookup, at most once per interval.
+workflow_reload_interval = float(os.environ.get("COMFY_WORKFLOW_RELOAD_INTERVAL", "2"))  # Default 2 seconds
+workflows = WorkflowRegistry(workflow_dir, workflow, prompt_node_id, output_node_id, workflow_reload_interval)
+# Preview renders run this share of the workflow's sampler steps
+preview_fraction = float(os.environ.get("COMFY_PREVIEW_FRACTION", "0.5"))  # Default half the steps
+
+# Configurable timeout settings
+max_poll_attempts = int(os.environ.get("COMFY_MAX_POLL_ATTEMPTS", "60"))  # Default 60 attempts
+poll_interval = float(os.environ.get("COMFY_POLL_INTERVAL", "2"))  # Default 2 seconds
+# Total time to wait for a render; defaults to what the attempts and interval above add up to
+render_timeout = float(os.environ.get("COMFY_RENDER_TIMEOUT", str(max_poll_attempts * poll_interval)))
+# Polls start this often and back off towards COMFY_POLL_INTERVAL, or sleep out the expected render time
+min_poll_interval = float(os.environ.get("COMFY_MIN_POLL_INTERVAL", "0.25"))  # Default 0.25 seconds
+render_times = RenderTimes()
+poll_stats = PollStats()
+# Jobs started with submit_image_job run in the background and may take far longer than a tool call
+job_timeout = float(os.environ.get("COMFY_JOB_TIMEOUT", "3600"))  # Default 1 hour
+
+ollama_api_base = os.environ.get("OLLAMA_API_BASE")
+prompt_llm = os.environ.get("PROMPT_LLM")
+# One chain for the life of the server; recent answers are remembered per topic
+prompt_cache_size = int(os.environ.get("PROMPT_CACHE_SIZE", "256"))  # Default 256 topics
+prompt_writer = PromptWriter(
+    ollama_api_base, prompt_llm, prompt_cache_size
+) if ollama_api_base is not None and prompt_llm is not None else None
+
+# Completion events are pushed over ComfyUI's websocket; history polling is the fallback
+use_websocket = os.environ.get("COMFY_USE_WEBSOCKET", "true").lower() != "false"
+client_id = str(uuid.uuid4())
+# Step and queue position updates sent to the client are spaced at least this far apart
+progress_interval = float(os.environ.get("COMFY_PROGRESS_INTERVAL", "1"))  # Default 1 second
+
+# Every stage of a job is timed into histograms shown by server_stats, and optionally written out
+metrics_jsonl = os.environ.get("COMFY_METRICS_JSONL")
+metrics_prometheus = os.environ.get("COMFY_METRICS_PROMETHEUS")
+metrics_interval = float(os.environ.get("COMFY_METRICS_INTERVAL", "15"))  # Default 15 seconds
+metrics = Metrics(metrics_jsonl)
+metrics_task = None
+
+# Keep-alive connection pool shared by every request to ComfyUI, with retries on transient errors
+http_options = HttpOptions(
+    max_connections=int(os.environ.get("COMFY_HTTP_MAX_CONNECTIONS", "10")),  # Default 10 per host
+    keepalive_expiry=float(os.environ.get("COMFY_HTTP_KEEPALIVE", "30")),  # Default 30 seconds
+    connect_timeout=float(os.environ.get("COMFY_HTTP_CONNECT_TIMEOUT", "5")),  # Default 5 seconds
+    timeout=float(os.environ.get("COMFY_HTTP_TIMEOUT", "30")),  # Default 30 seconds
+    retries=int(os.environ.get("COMFY_HTTP_RETRIES", "3")),  # Default 3 retries
+    backoff=float(os.environ.get("COMFY_HTTP_BACKOFF", "0.5")),  # Default 0.5 seconds, doubling
+)
+
+# Jobs go to the least loaded healthy backend; unhealthy ones rejoin once /queue answers again
+health_interval = float(os.environ.get("COMFY_HEALTH_INTERVAL", "10"))  # Default 10 seconds
+backends = BackendPool([
+    Backend(ComfyClient(
+        server,
+        override_hosts[i] if i < len(override_hosts) and override_hosts[i] else server,
+        client_id, use_websocket, http_options, metrics,
+    ))
+    for i, server in enumerate(hosts)
+], health_interval, render_times=render_times)
+
+# How many prompts this server keeps queued in each ComfyUI at once, and how many more may wait for a slot
+max_in_flight = int(os.environ.get("COMFY_MAX_IN_FLIGHT", "4"))  # Default 4 jobs per backend
+max_waiting = int(os.environ.get("COMFY_MAX_WAITING", "32"))  # Default 32 jobs
+scheduler = JobScheduler(max_in_flight * max(1, len(hosts)), max_waiting)
+
+local_save_dir = os.environ.get("COMFY_LOCAL_SAVE_DIR", "./generated_images")
+
+# Images are streamed to disk in chunks of this size, so memory per job stays flat
+download_chunk_size = int(os.environ.get("COMFY_DOWNLOAD_CHUNK_KB", "64")) * 1024  # Default 64KB
+
+# Results can carry an inline JPEG preview, made while the full image is being saved
+thumbnail_size = int(os.environ.get("COMFY_THUMBNAIL_SIZE", "512"))  # Default 512 pixels on the long side
+thumbnail_kb = int(os.environ.get("COMFY_THUMBNAIL_KB", "64"))  # Default 64KB
+use_thumbnails = os.environ.get("COMFY_THUMBNAILS", "false").lower() == "true"
+
+# Local copies are WebP by default; encoder settings can also be overridden per call
+default_encode_options = EncodeOptions(
+    format=os.environ.get("COMFY_IMAGE_FORMAT", "webp").lower(),
+    quality=int(os.environ.get("COMFY_WEBP_QUALITY", "85")),
+    method=int(os.environ.get("COMFY_WEBP_METHOD", "6")),
+    lossless=os.environ.get("COMFY_WEBP_LOSSLESS", "false").lower() == "true",
+    thumbnail=thumbnail_size if use_thumbnails else 0,
+    thumbnail_bytes=thumbnail_kb * 1024,
+)
+# Encoding runs in worker processes; 0 keeps it in a thread of the server process
+encoder = ImageEncoder(int(os.environ.get("COMFY_ENCODE_WORKERS", str(default_workers()))))
+
+# Every job's progress is journaled, so results can still be collected after a restart
+use_journal = os.environ.get("COMFY_JOB_JOURNAL", "true").lower() != "false"
+job_max_age_hours = float(os.environ.get("COMFY_JOB_MAX_AGE_HOURS", "168"))  # Default 1 week
+journal = JobJournal(
+    os.path.join(local_save_dir, ".jobs.jsonl") if use_journal else None,
+    job_max_age_hours * 3600,
+)
+# Jobs an earlier process left in ComfyUI are followed up once the first tool call starts the services
+recovered = False
+# Jobs this process is working on right now, which get_job_result must not collect twice
+running_jobs = set()
+# The shared tracker: one task per background job, which status and wait calls only look at
+job_tasks = {}
+# Set once the client has gone or the server was told to stop, so the renders cancelled on the
+# way out are left to finish in ComfyUI and be picked up by the next process
+shutting_down = False
+
+# Input images are stored by content hash and uploaded to each backend once
+input_images = InputImages(os.path.join(local_save_dir, ".inputs"))
+# The only folder upload_image may read from by path. Unset, any file is allowed over stdio, where the
+# client runs as the same user, and none over SSE or streamable HTTP, where anyone who can connect could ask
+upload_dir = os.environ.get("COMFY_UPLOAD_DIR")
+
+# Finished renders are cached by the hash of the effective workflow, so repeats skip ComfyUI entirely
+use_cache = os.environ.get("COMFY_CACHE", "true").lower() != "false"
+cache_max_mb = float(os.environ.get("COMFY_CACHE_MAX_MB", "1024"))  # Default 1GB
+cache_max_age_hours = float(os.environ.get("COMFY_CACHE_MAX_AGE_HOURS", "168"))  # Default 1 week
+result_cache = ResultCache(
+    os.path.join(local_save_dir, ".cache"),
+    int(cache_max_mb * 1024 * 1024),
+    cache_max_age_hours * 3600,
+) if use_cache else None
+# Identical requests arriving while one is rendering wait for it instead of rendering again
+in_flight = InFlightRenders()
+
+
+if ollama_api_base is not None and prompt_llm is not None:
+    @mcp.tool()
+    async def generate_prompt(topic: str, ctx: Context, stream: bool = False) -> str:
+        """Write an image generation prompt for a provided topic
+
+        With stream set, the text written so far is sent as progress notifications.
+        """
+
+        on_token = None
+        if stream:
+            last_sent = 0.0
+
+            async def on_token(text: str, count: int):
+                nonlocal last_sent
+                # At most ten updates a second, however fast the model writes
+                now = time.monotonic()
+                if now - last_sent >= 0.1:
+                    last_sent = now
+                    await ctx.report_progress(count, None, text)
+
+        return await prompt_writer.write(topic, on_token)
+
+
+def encode_options(image_format: str | None, quality: int | None, effort: int | None,
+                   lossless: bool | None, thumbnail: bool | None = None) -> EncodeOptions:
+    options = default_encode_options
+    return EncodeOptions(
+        format=(image_format or options.format).lower(),
+        quality=options.quality if quality is None else max(0, min(100, quality)),
+        method=options.method if effort is None else max(0, min(6, effort)),
+        lossless=options.lossless if lossless is None else lossless,
+        thumbnail=options.thumbnail if thumbnail is None else (thumbnail_size if thumbnail else 0),
+        thumbnail_bytes=options.thumbnail_bytes,
+    )
+
+
+async def fetch_image(comfy: ComfyClient, output: dict, name: str,
+                      options: EncodeOptions) -> tuple[str, int, str | None, bytes | None] | None:
+    """Stream one output image to disk and store it, as WebP unless the PNG should be kept as is
+
+    Returns the local path, the downloaded size in bytes, any conversion error and the
+    thumbnail if options asked for one.
+    """
+
+    # Save image locally for Claude Code to access
+    os.makedirs(local_save_dir, exist_ok=True)
+
+    # Timestamp plus prompt id, so concurrent jobs never write the same file
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    basename = os.path.abspath(os.path.join(local_save_dir, f"image_{timestamp}_{name}"))
+
+    # Download next to the final file, so a kept PNG is just renamed into place
+    part_path = f"{basename}.part"
+    try:
+        with metrics.span("download", comfy.server):
+            size = await comfy.download(output, part_path, download_chunk_size)
+    except BaseException:
+        metrics.count("download_errors", comfy.server)
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    if size is None:
+        metrics.count("download_errors", comfy.server)
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        return None
+
+    local_path, error, thumbnail, timings = await encoder.save(part_path, basename, options)
+    for stage, seconds in timings.items():
+        metrics.observe(stage, seconds)
+    return local_path, size, error, thumbnail
+
+
+def image_result(remote_url: str, local_path: str | None, original_size_kb: float | None,
+                 cached: bool = False, label: str = "") -> TextContent:
+    status = "Image generated successfully! (cached)" if cached else "Image generated successfully!"
+    if local_path is None:
+        # URL output mode, nothing was downloaded
+        return TextContent(type="text", text=f"{label}{status}\n\nRemote URL: {remote_url}")
+    if local_path.endswith(".webp"):
+        # Calculate size reduction
+        webp_size_kb = os.path.getsize(local_path) / 1024
+        reduction_percent = ((original_size_kb - webp_size_kb) / original_size_kb) * 100
+        size_text = (f"Size: {original_size_kb:.1f}KB (PNG) -> {webp_size_kb:.1f}KB (WebP)\n"
+                     f"Compression: {reduction_percent:.1f}% smaller\n\n")
+    else:
+        size_text = f"Size: {original_size_kb:.1f}KB (PNG)\n\n"
+    return TextContent(
+        type="text",
+        text=f"{label}{status}\n\n"
+             f"Remote URL: {remote_url}\n"
+             f"Local Path: {local_path}\n"
+             f"{size_text}"
+             f"You can read the image from the local path using the Read tool."
+    )
+
+
+def thumbnail_content(data: bytes) -> ImageContent:
+    return ImageContent(type="image", data=base64.b64encode(data).decode("ascii"), mimeType=THUMBNAIL_MIME_TYPE)
+
+
+async def image_results(images: list[dict], options: EncodeOptions, cached: bool = False,
+                        label: str = "") -> list[TextContent | ImageContent]:
+    """Describe images saved earlier, with thumbnails made from the local files if asked for"""
+    results = []
+    for image in images:
+        results.append(image_result(image["remote_url"], image["local_path"], image["original_size_kb"],
+                                    cached=cached, label=label))
+        if options.thumbnail > 0 and image["local_path"] is not None and os.path.exists(image["local_path"]):
+            thumbnail = await encoder.thumbnail(image["local_path"], options)
+            if thumbnail is not None:
+                results.append(thumbnail_content(thumbnail))
+    return results
+
+
+async def report_queue_position(comfy: ComfyClient, prompt_id: str, progress: ProgressReporter):
+    """Tell the client where the prompt is in the queue, skipping this update if ComfyUI doesn't answer"""
+    try:
+        queue = await comfy.queue()
+    except httpx.HTTPError as e:
+        # Only progress, the render itself is still waited for
+        logger.debug(f"Queue position of {prompt_id} unavailable on {comfy.server}: {type(e).__name__}")
+        return
+    if queue is not None:
+        await progress.queued(queue_position(queue, prompt_id))
+
+
+async def watch_prompt(comfy: ComfyClient, prompt_id: str, timeout: float,
+                       progress: ProgressReporter | None) -> bool:
+    """Wait on the websocket for a prompt to finish, reporting queue position and steps meanwhile"""
+
+    listener = comfy.listener
+    if progress is None:
+        return await listener.wait(prompt_id, timeout)
+
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        # Look more often than we send, so updates aren't skipped by landing just short of the interval
+        if await listener.wait(prompt_id, min(remaining, progress.interval / 4)):
+            return True
+        state = listener.state(prompt_id)
+        if state.progress is not None:
+            await progress.step(*state.progress)
+        elif not state.started and progress.due():
+            await report_queue_position(comfy, prompt_id, progress)
+
+
+async def wait_for_output(comfy: ComfyClient, prompt_id: str, output_node: str, ctx: Context,
+                          progress: ProgressReporter | None = None,
+                          render_key=None, timeout: float | None = None,
+                          listen: bool = True) -> list[dict] | None:
+    """Wait for a submitted prompt to finish and return every image of the output node
+
+    Jobs with the same render_key are expected to take about as long as the last few,
+    so polling can sleep through most of that time. timeout defaults to COMFY_RENDER_TIMEOUT.
+    listen=False polls history even with the websocket up, for prompts whose events go to
+    another client id.
+    """
+
+    listener = comfy.listener if listen else None
+    generation = listener.generation if listener is not None else None
+    submitted = time.time()
+    schedule = PollSchedule(render_times.expected(render_key), min_poll_interval, poll_interval)
+    deadline = schedule.started + (timeout or render_timeout)
+    # When ComfyUI started and finished the job by the wall clock, and when it said so itself if we polled
+    began = None
+    finished = None
+    reported = None
+    try:
+        while (remaining := deadline - time.monotonic()) > 0:
+            if listener is not None and listener.connected:
+                # Events sent while we were disconnected are lost, so check history once after a reconnect
+                if generation != listener.generation:
+                    generation = listener.generation
+                    history = await comfy.history(prompt_id)
+                    if history is not None and history['status']['completed']:
+                        began = started_at(history)
+                        finished = finished_at(history) or time.time()
+                        return history['outputs'][output_node]['images']
+                if not await watch_prompt(comfy, prompt_id, min(remaining, poll_interval), progress):
+                    continue
+                state = listener.state(prompt_id)
+                if state.error is not None:
+                    metrics.count("render_errors", comfy.server)
+                    await ctx.error(f"Execution failed: {state.error}")
+                    return None
+                began = state.started_at
+                finished = time.time()
+                outputs = state.outputs.get(output_node)
+                if outputs and outputs.get('images'):
+                    return outputs['images']
+                # Output node was cached or not reported, history has the full result
+                history = await comfy.history(prompt_id)
+                if history is not None:
+                    return history['outputs'][output_node]['images']
+                return None
+
+            generation = None
+            history = await comfy.history(prompt_id)
+            schedule.polls += 1
+            if history is not None:
+                reported = finished_at(history)
+                if history['status']['completed']:
+                    began = started_at(history)
+                    finished = reported or time.time()
+                    return history['outputs'][output_node]['images']
+                # Prompts only show up in history once they ended, so this one failed or was interrupted
+                metrics.count("render_errors", comfy.server)
+                await ctx.error(f"Execution failed: {history['status'].get('status_str', 'error')}")
+                return None
+            # Without the websocket there are no step events, but the queue still shows how far off we are.
+            # Its updates keep their own interval, so a long sleep until the next poll doesn't hold them up
+            wake = time.monotonic() + min(remaining, schedule.next_delay())
+            while (left := wake - time.monotonic()) > 0:
+                if progress is None:
+                    await asyncio.sleep(left)
+                    break
+                if progress.due():
+                    await report_queue_position(comfy, prompt_id, progress)
+                await asyncio.sleep(min(wake - time.monotonic(), progress.interval))
+        metrics.count("render_timeouts", comfy.server)
+        return None
+    finally:
+        if listener is not None:
+            listener.forget(prompt_id)
+        if schedule.polls:
+            poll_stats.record(schedule.polls, reported)
+        # Learn from the actual finish, not from when we noticed it
+        if finished is not None:
+            if render_key is not None:
+                render_times.record(render_key, finished - submitted)
+            if began is not None:
+                metrics.observe("queue_wait", max(0.0, began - submitted), comfy.server)
+                metrics.observe("render", max(0.0, finished - began), comfy.server)
+            else:
+                # Without a start time the queue wait can't be told apart from the render
+                metrics.observe("render", max(0.0, finished - submitted), comfy.server)
+
+
+# Cancellations still being sent to ComfyUI, referenced so they aren't garbage collected mid-way
+cancelling = set()
+
+
+async def cancel_prompt(comfy: ComfyClient, prompt_id: str):
+    """Take an abandoned prompt off ComfyUI: drop it from the queue, or interrupt it if it's running"""
+    try:
+        await comfy.delete([prompt_id])
+        queue = await comfy.queue()
+        if queue is not None and queue_position(queue, prompt_id) == 0:
+            await comfy.interrupt(prompt_id)
+    except Exception as e:
+        logger.warning(f"Could not cancel prompt {prompt_id} on {comfy.server}: {e}")
+
+
+def abandon(comfy: ComfyClient, prompt_id: str):
+    # A task of its own, since the caller may be in the middle of being cancelled
+    task = asyncio.get_running_loop().create_task(cancel_prompt(comfy, prompt_id))
+    cancelling.add(task)
+    task.add_done_callback(cancelling.discard)
+
+
+def backend_for(server: str | None) -> Backend | None:
+    for backend in backends.backends:
+        if backend.name == server:
+            return backend
+    return None
+
+
+async def check_job(job_id: str):
+    """Update a submitted job from ComfyUI's history and queue"""
+    job = journal.get(job_id)
+    backend = backend_for(job.get("backend"))
+    if backend is None:
+        journal.record(job_id, status=FAILED, error="its ComfyUI server is no longer configured")
+        return
+    history = await backend.client.history(job["prompt_id"])
+    if history is not None:
+        if history['status']['completed']:
+            journal.record(job_id, status=RENDERED, outputs=history['outputs'][job["output_node"]]['images'])
+        else:
+            journal.record(job_id, status=FAILED, error=history['status'].get('status_str', 'error'))
+        return
+    queue = await backend.client.queue()
+    if queue is not None and queue_position(queue, job["prompt_id"]) is None:
+        # Neither finished nor queued, ComfyUI must have restarted
+        journal.record(job_id, status=FAILED, error="ComfyUI no longer knows the prompt")
+
+
+def recover_jobs():
+    """Pick up the jobs server processes that are no longer running left behind"""
+    for job_id in journal.claim():
+        job = journal.get(job_id)
+        if job["status"] == QUEUED:
+            journal.record(job_id, status=FAILED, error="the server restarted before it was submitted")
+        else:
+            follow_job(job_id)
+
+
+def session_id(ctx) -> str | None:
+    """The client session a tool call came from, or None over stdio where the process has one client"""
+    try:
+        request = ctx.request_context.request
+    except (AttributeError, ValueError):
+        return None
+    if request is None:
+        return None
+    # Streamable HTTP names the session in a header, SSE in the URL messages are posted to
+    return request.headers.get("mcp-session-id") or request.query_params.get("session_id")
+
+
+class BackgroundContext:
+    """Stands in for the request context of a background job, whose tool call has already returned"""
+
+    async def info(self, message: str):
+        logger.info(message)
+
+    async def error(self, message: str):
+        logger.error(message)
+
+    async def report_progress(self, progress: float, total: float | None = None, message: str | None = None):
+        pass
+
+
+async def run_tracked(job_id: str, job):
+    try:
+        await job
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.exception(f"Job {job_id} failed")
+        journal.record(job_id, status=FAILED, error=str(e))
+
+
+def track_job(job_id: str, job) -> asyncio.Task:
+    """Run a job in the background under the shared tracker"""
+    task = asyncio.get_running_loop().create_task(run_tracked(job_id, job))
+    job_tasks[job_id] = task
+    task.add_done_callback(lambda _: job_tasks.pop(job_id, None))
+    return task
+
+
+async def reported(job, label: str = "") -> list[TextContent | ImageContent]:
+    """Await a render of a batch, turning an error into its failure result so the others carry on"""
+    try:
+        return await job
+    except Exception as e:
+        logger.exception(f"Render failed: {label.strip()}")
+        return [TextContent(type="text", text=f"{label}Failed: {type(e).__name__}: {e}")]
+
+
+async def collect_job(job_id: str, ctx: Context, label: str = "") -> list[TextContent | ImageContent]:
+    """Download the images of a rendered job and mark it done"""
+    job = journal.get(job_id)
+    backend = backend_for(job.get("backend"))
+    if backend is None:
+        journal.record(job_id, status=FAILED, error="its ComfyUI server is no longer configured")
+        return [TextContent(type="text", text=f"{label}Its ComfyUI server is no longer configured.")]
+    options = EncodeOptions(**job["options"])
+    results, saved = await collect_images(backend.client, job["prompt_id"], job["outputs"], options, ctx, label)
+    if not results:
+        return [TextContent(type="text", text=f"{label}Failed to download image. Please check server logs.")]
+    journal.record(job_id, status=DONE, images=saved)
+    if result_cache is not None:
+        result_cache.put(job["cache_key"], saved)
+    return results
+
+
+async def resume_job(job_id: str):
+    """Finish a job whose render was started by an earlier process or an abandoned call"""
+    ctx = BackgroundContext()
+    running_jobs.add(job_id)
+    try:
+        if journal.get(job_id)["status"] == SUBMITTED:
+            try:
+                await check_job(job_id)
+            except httpx.HTTPError as e:
+                # Left as it is, the next status or result call tries again
+                logger.warning(f"Could not check job {job_id}: {e}")
+                return
+        job = journal.get(job_id)
+        if job["status"] == SUBMITTED:
+            backend = backend_for(job["backend"])
+            output_data = await wait_for_output(
+                backend.client, job["prompt_id"], job["output_node"], ctx,
+                render_key=(backend.name, job["workflow"]), timeout=job_timeout,
+                # ComfyUI sends a prompt's events only to the process that submitted it
+                listen=job_id not in journal.adopted)
+            if not output_data:
+                journal.record(job_id, status=FAILED, error="render failed")
+                return
+            journal.record(job_id, status=RENDERED, outputs=output_data)
+        if journal.get(job_id)["status"] == RENDERED:
+            await collect_job(job_id, ctx)
+    finally:
+        running_jobs.discard(job_id)
+
+
+def follow_job(job_id: str) -> asyncio.Task | None:
+    """Return the background task of a job, starting one for a render nobody is waiting on
+
+    Jobs another running server looks after are left to it.
+    """
+    task = job_tasks.get(job_id)
+    if (task is None and job_id not in running_jobs and journal.get(job_id)["status"] in (SUBMITTED, RENDERED)
+            and journal.owns(job_id)):
+        task = track_job(job_id, resume_job(job_id))
+    return task
+
+
+async def job_result(job_id: str, ctx: Context) -> list[TextContent | ImageContent]:
+    """Describe a job's images if it's done, or what state it's in"""
+    label = f"Job {job_id}\n"
+    job = journal.get(job_id)
+    if job is None:
+        if job_id in job_tasks:
+            return [TextContent(type="text", text=f"{label}Still {QUEUED}, try again later.")]
+        return [TextContent(type="text", text=f"Unknown job {job_id}.")]
+
+    task = follow_job(job_id)
+    if task is not None and job["status"] == RENDERED:
+        # Only the download is left, which is quick enough to wait for
+        await asyncio.shield(task)
+        job = journal.get(job_id)
+
+    if job["status"] == DONE:
+        return await image_results(job["images"], EncodeOptions(**job["options"]), label=label)
+    if job["status"] == FAILED:
+        return [TextContent(type="text", text=f"{label}The job failed: {job.get('error', 'unknown error')}")]
+    if job["status"] == CANCELLED:
+        return [TextContent(type="text", text=f"{label}The job was cancelled.")]
+    return [TextContent(type="text", text=f"{label}Still {job['status']}, try again later.")]
+
+
+async def with_deadline(job, timeout: float | None) -> list[TextContent | ImageContent]:
+    """Await a render, giving up and cancelling it in ComfyUI after timeout seconds"""
+    if timeout is None:
+        return await job
+    try:
+        return await asyncio.wait_for(job, timeout)
+    except asyncio.TimeoutError:
+        return [TextContent(type="text", text=f"Timed out after {timeout:g} seconds, the job was cancelled.")]
+
+
+async def export_metrics():
+    while True:
+        await asyncio.sleep(metrics_interval)
+        metrics.flush()
+        if metrics_prometheus:
+            metrics.write_prometheus(metrics_prometheus)
+
+
+def shut_down():
+    global shutting_down
+    shutting_down = True
+
+
+async def run_transport(run, *args):
+    """Serve with one of the transports until it exits, then close the backend connections,
+    their listeners and the encoder workers, and let other servers take over unfinished jobs"""
+    try:
+        await run(mcp, *args, shut_down)
+    finally:
+        with anyio.CancelScope(shield=True):
+            await backends.close()
+        encoder.shutdown()
+        journal.close()
+
+
+def start_services():
+    """Start the backend connections, encoder workers and job recovery on first use"""
+    global recovered, metrics_task
+    backends.start()
+    encoder.warm()
+    if metrics_task is None and (metrics_jsonl or metrics_prometheus):
+        metrics_task = asyncio.get_running_loop().create_task(export_metrics())
+    if not recovered:
+        recovered = True
+        recover_jobs()
+
+
+async def collect_images(comfy: ComfyClient, prompt_id: str, output_data: list[dict], options: EncodeOptions,
+                         ctx: Context, label: str = "") -> tuple[list[TextContent | ImageContent], list[dict]]:
+    """Download and store the images of a finished prompt, describing each and listing what was saved"""
+
+    results = []
+    saved = []
+    if output_mode == "url":
+        for output in output_data:
+            override_file_url = comfy.file_url(output)
+            results.append(image_result(override_file_url, None, None, label=label))
+            saved.append({"local_path": None, "remote_url": override_file_url, "original_size_kb": None})
+        return results, saved
+
+    fetched = await asyncio.gather(*[
+        fetch_image(comfy, output, prompt_id[:8] if len(output_data) == 1 else f"{prompt_id[:8]}_{i}", options)
+        for i, output in enumerate(output_data)
+    ])
+    for output, image in zip(output_data, fetched):
+        if image is None:
+            continue
+        local_path, size, error, thumbnail = image
+        override_file_url = comfy.file_url(output)
+        original_size_kb = size / 1024
+
+        if error is not None:
+            await ctx.error(f"WebP conversion failed: {error}, falling back to PNG")
+        elif local_path.endswith(".webp"):
+            webp_size_kb = os.path.getsize(local_path) / 1024
+            reduction_percent = ((original_size_kb - webp_size_kb) / original_size_kb) * 100
+            await ctx.info(f"Saved to {local_path}: {original_size_kb:.1f}KB -> {webp_size_kb:.1f}KB ({reduction_percent:.1f}% reduction)")
+
+        results.append(image_result(override_file_url, local_path, original_size_kb, label=label))
+        if thumbnail is not None:
+            results.append(thumbnail_content(thumbnail))
+        saved.append({
+            "local_path": local_path,
+            "remote_url": override_file_url,
+            "original_size_kb": original_size_kb,
+        })
+    return results, saved
+
+
+async def render_job(wf: CompiledWorkflow, values: dict, ctx: Context, label: str = "",
+                     options: EncodeOptions = default_encode_options,
+                     report_progress: bool = True, job_id: str | None = None,
+                     timeout: float | None = None, session: str | None = None) -> list[TextContent | ImageContent]:
+    """Render one workflow submission end to end and describe every image it produced
+
+    With report_progress set, queue position and sampler steps are sent as progress
+    notifications; tools running several jobs report their own progress instead.
+    Every step is written to the job journal, under job_id if given. timeout bounds the
+    render itself, COMFY_RENDER_TIMEOUT by default. session ties the job to the client
+    that asked for it, so job listings only show a client its own jobs.
+    """
+
+    job_id = job_id or new_job_id()
+    running_jobs.add(job_id)
+    try:
+        with metrics.span("job"):
+            return await _render_job(wf, values, ctx, label, options, report_progress, job_id, timeout, session)
+    finally:
+        running_jobs.discard(job_id)
+
+
+async def _render_job(wf: CompiledWorkflow, values: dict, ctx: Context, label: str,
+                      options: EncodeOptions, report_progress: bool, job_id: str,
+                      timeout: float | None, session: str | None) -> list[TextContent | ImageContent]:
+    workflow_text = wf.template.render(values)
+    cache_key = workflow_key(
+        workflow_text, wf.output_node_id, "url" if output_mode == "url" else options.cache_tag())
+    journal.record(job_id, status=QUEUED, created=time.time(), workflow=wf.name, label=label.strip(),
+                   output_node=wf.output_node_id, options=asdict(options), cache_key=cache_key,
+                   session=session or session_id(ctx))
+
+    if result_cache is not None:
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            await ctx.info(f"{label}Returning cached image")
+            journal.record(job_id, status=DONE, images=cached)
+            return await image_results(cached, options, cached=True, label=label)
+
+    while (shared := in_flight.get(cache_key)) is not None:
+        await ctx.info(f"{label}Joining an identical render already in progress")
+        in_flight.join(cache_key)
+        try:
+            # wait() never cancels what it waits on, so leaving doesn't cancel the render for the others
+            await asyncio.wait({shared})
+        except asyncio.CancelledError:
+            in_flight.leave(cache_key)
+            # The last one waiting cancels a prompt handed over for it in ComfyUI
+            if not shutting_down and cache_key not in in_flight.waiting and (
+                    handed_over := in_flight.take_over(cache_key)) is not None:
+                abandon(backend_for(handed_over[0]).client, handed_over[1])
+            if not shutting_down:
+                journal.record(job_id, status=CANCELLED)
+            raise
+        in_flight.leave(cache_key)
+        if shared.cancelled():
+            # Whoever was rendering gave up; take the render over, or join whoever did first
+            continue
+        leader_id, saved, error = shared.result()
+        if saved is None:
+            journal.record(job_id, status=FAILED, error=error, joined=leader_id)
+            return [TextContent(type="text", text=f"{label}The identical render this joined failed: {error}")]
+        in_flight.joined += 1
+        journal.record(job_id, status=DONE, images=saved, joined=leader_id)
+        return await image_results(saved, options, label=label)
+
+    future = in_flight.lead(cache_key)
+    handed_over = in_flight.take_over(cache_key)
+    try:
+        results = await _submit_render(wf, values, workflow_text, cache_key, ctx, label, options,
+                                       report_progress, job_id, timeout, handed_over)
+        job = journal.get(job_id)
+        future.set_result((job_id, job.get("images") if job["status"] == DONE else None, job.get("error")))
+        return results
+    finally:
+        in_flight.finish(cache_key, future)
+
+
+async def _submit_render(wf: CompiledWorkflow, values: dict, workflow_text: str, cache_key: str, ctx: Context,
+                         label: str, options: EncodeOptions, report_progress: bool, job_id: str,
+                         timeout: float | None, handed_over: tuple[str, str] | None = None,
+                         ) -> list[TextContent | ImageContent]:
+    """Submit a render, or wait for the prompt handed over by a cancelled leader, and collect its images"""
+    start_services()
+    if len(backends.backends) > 1:
+        await backends.ready(2.0)
+
+    prompt_id = None
+    output_data = None
+
+    try:
+        # The slot covers the time the prompt spends in ComfyUI, downloads happen after it is freed
+        async with scheduler.slot():
+            # Fail over to the next backend if one can't take the prompt
+            for backend in backends.ranked(wf.name) if handed_over is None else [backend_for(handed_over[0])]:
+                comfy = backend.client
+                # Counted from the moment it's chosen, so concurrent jobs spread across backends
+                with backends.track(backend):
+                    if handed_over is not None:
+                        # Already queued there by the request this one waited on
+                        prompt_id = handed_over[1]
+                    else:
+                        if comfy.listener is not None:
+                            # Give a cold listener a moment so the first job doesn't fall back to polling
+                            await comfy.listener.wait_connected(1.0)
+                        try:
+                            if wf.image_input in values:
+                                # Input images are named by content, so uploading one again elsewhere is harmless
+                                with metrics.span("upload", backend.name):
+                                    await input_images.ensure(comfy, values[wf.image_input])
+                        except httpx.TransportError as e:
+                            metrics.count("submit_errors", backend.name)
+                            backends.mark_failed(backend, e)
+                            continue
+                        except RuntimeError as e:
+                            metrics.count("submit_errors", backend.name)
+                            await ctx.error(str(e))
+                            continue
+                        try:
+                            with metrics.span("submit", backend.name):
+                                prompt_id = await comfy.submit(workflow_text)
+                        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                            # The prompt never reached this backend, so the next one can take it
+                            metrics.count("submit_errors", backend.name)
+                            backends.mark_failed(backend, e)
+                            continue
+                        except httpx.TransportError as e:
+                            # It may be queued there already, and sending it on could render it twice
+                            metrics.count("submit_errors", backend.name)
+                            error = f"no answer from {backend.name} after sending the prompt ({type(e).__name__})"
+                            journal.record(job_id, status=FAILED, error=error)
+                            return [TextContent(
+                                type="text", text=f"{label}Failed to submit: {error}. It may still render there.")]
+                        if prompt_id is None:
+                            metrics.count("submit_errors", backend.name)
+                            continue
+
+                    journal.record(job_id, status=SUBMITTED, prompt_id=prompt_id, backend=comfy.server)
+                    try:
+                        await ctx.info(f"{label}Submitted prompt as job {job_id}")
+                        progress = ProgressReporter(ctx, progress_interval, label) if report_progress else None
+                        output_data = await wait_for_output(
+                            comfy, prompt_id, wf.output_node_id, ctx, progress, (backend.name, wf.name), timeout)
+                    except asyncio.CancelledError:
+                        # The client cancelled or the deadline passed, don't leave the GPU rendering for nobody.
+                        # Requests waiting on the same render finish it rather than submitting it again
+                        if not shutting_down:
+                            if not in_flight.hand_over(cache_key, comfy.server, prompt_id):
+                                abandon(comfy, prompt_id)
+                            journal.record(job_id, status=CANCELLED)
+                        raise
+                    if output_data:
+                        backend.completed += 1
+                    else:
+                        abandon(comfy, prompt_id)
+                    break
+    except SchedulerBusy as e:
+        if handed_over is not None:
+            abandon(backend_for(handed_over[0]).client, handed_over[1])
+        journal.record(job_id, status=FAILED, error="server busy")
+        return [TextContent(type="text", text=f"{label}Server busy ({e}), please try again later.")]
+    except asyncio.CancelledError:
+        # Left queued on shutdown, so the next process reports it failed to start rather than cancelled
+        if journal.get(job_id)["status"] == QUEUED and not shutting_down:
+            # Cancelled while waiting for a slot, pass on the prompt this one took over
+            if handed_over is not None and not in_flight.hand_over(cache_key, *handed_over):
+                abandon(backend_for(handed_over[0]).client, handed_over[1])
+            journal.record(job_id, status=CANCELLED)
+        raise
+
+    if not output_data:
+        journal.record(job_id, status=FAILED, error="render failed")
+        return [TextContent(type="text", text=f"{label}Failed to generate image. Please check server logs.")]
+    journal.record(job_id, status=RENDERED, outputs=output_data)
+    await ctx.info(f"{label}Image generated")
+
+    results, saved = await collect_images(comfy, prompt_id, output_data, options, ctx, label)
+    if not results:
+        journal.record(job_id, status=FAILED, error="download failed")
+        return [TextContent(type="text", text=f"{label}Failed to download image. Please check server logs.")]
+    journal.record(job_id, status=DONE, images=saved)
+
+    if result_cache is not None:
+        result_cache.put(cache_key, saved)
+    return results
+
+
+def job_values(wf: CompiledWorkflow, prompt: str, seed: int | None = None, steps: int | None = None,
+               cfg: float | None = None, width: int | None = None, height: int | None = None,
+               batch_size: int | None = None, preview: bool = False, image: str | None = None) -> dict:
+    """Map a request's overrides onto the workflow's inputs, raising ValueError if one can't be set"""
+
+    values = {wf.prompt_input: prompt}
+    if image is not None:
+        if wf.image_input is None:
+            raise ValueError("This workflow has no LoadImage node to take an input image.")
+        if image not in input_images:
+            raise ValueError(f"Unknown image '{image}', upload it with upload_image first.")
+        values[wf.image_input] = image
+    if seed is not None:
+        if wf.seed_input is None:
+            raise ValueError("This workflow has no sampler seed that can be set.")
+        # -1 asks for a fresh seed, the way ComfyUI's "randomize" does
+        values[wf.seed_input] = random.randrange(2 ** 48) if seed < 0 else seed
+    if steps is not None or preview:
+        if wf.steps_input is None:
+            raise ValueError("This workflow has no sampler steps that can be set.")
+        if steps is None:
+            steps = max(1, round(wf.template.defaults[wf.steps_input] * preview_fraction))
+        elif steps <= 0:
+            raise ValueError("steps must be positive.")
+        values[wf.steps_input] = steps
+    if cfg is not None:
+        if wf.cfg_input is None:
+            raise ValueError("This workflow has no sampler cfg that can be set.")
+        values[wf.cfg_input] = cfg
+    if width is not None or height is not None:
+        if wf.size_inputs is None:
+            raise ValueError("This workflow has no latent image node with a size.")
+        if (width is not None and width <= 0) or (height is not None and height <= 0):
+            raise ValueError("width and height must be positive.")
+        if width is not None:
+            values[wf.size_inputs[0]] = width
+        if height is not None:
+            values[wf.size_inputs[1]] = height
+    if batch_size is not None:
+        if wf.batch_input is None:
+            raise ValueError("This workflow has no latent image node with a batch size.")
+        if batch_size <= 0:
+            raise ValueError("batch_size must be positive.")
+        values[wf.batch_input] = batch_size
+    return values
+
+
+def prepare_job(prompt: str, image_format: str | None, quality: int | None, effort: int | None,
+                lossless: bool | None, thumbnail: bool | None, workflow: str | None,
+                seed: int | None, steps: int | None, cfg: float | None, width: int | None,
+                height: int | None, batch_size: int | None, preview: bool,
+                image: str | None) -> tuple[CompiledWorkflow, dict, str, EncodeOptions]:
+    """Check a single image request and resolve its workflow, values, label and encoding"""
+
+    if image_format is not None and image_format.lower() not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image_format, use one of: {', '.join(IMAGE_FORMATS)}")
+    wf = workflows.get(workflow)
+    if wf is None:
+        raise ValueError(unknown_workflow(workflow)[0].text)
+    values = job_values(wf, prompt, seed, steps, cfg, width, height, batch_size, preview, image)
+    # Report a random seed, so a liked image can be rendered again
+    label = f"Seed: {values[wf.seed_input]}\n" if seed is not None and seed < 0 else ""
+    return wf, values, label, encode_options(image_format, quality, effort, lossless, thumbnail)
+
+
+def unknown_workflow(name: str | None) -> list[TextContent]:
+    available = ", ".join(workflows.names()) or "none"
+    if name is None:
+        return [TextContent(type="text", text=f"No workflow could be loaded. Available workflows: {available}")]
+    return [TextContent(type="text", text=f"Unknown workflow '{name}'. Available workflows: {available}")]
+
+
+@mcp.tool()
+async def generate_image(
+    prompt: str,
+    ctx: Context,
+    image_format: str | None = None,
+    quality: int | None = None,
+    effort: int | None = None,
+    lossless: bool | None = None,
+    thumbnail: bool | None = None,
+    timeout: float | None = None,
+    workflow: str | None = None,
+    seed: int | None = None,
+    steps: int | None = None,
+    cfg: float | None = None,
+    width: int | None = None,
+    height: int | None = None,
+    batch_size: int | None = None,
+    preview: bool = False,
+    image: str | None = None,
+) -> list[TextContent | ImageContent]:
+    """Generate an image using ComfyUI workflow
+
+    workflow picks one of the workflows listed by list_workflows; the default is used
+    when it's omitted. seed (-1 for a random one), steps, cfg, width, height and
+    batch_size override the workflow's own values. preview renders with a fraction of
+    the steps, for a quick look before the full-quality render. image is a handle from
+    upload_image for the workflow's LoadImage node. The local copy is saved as WebP
+    unless image_format is "png", which keeps ComfyUI's PNG untouched. quality (0-100),
+    effort (0 fastest to 6 smallest) and lossless tune the WebP encoder. thumbnail adds
+    a small inline preview of each image to the result, so it can be looked at without
+    reading the full file. With timeout set, the job is cancelled in ComfyUI if it
+    hasn't finished after that many seconds.
+    """
+    try:
+        wf, values, label, options = prepare_job(
+            prompt, image_format, quality, effort, lossless, thumbnail, workflow,
+            seed, steps, cfg, width, height, batch_size, preview, image)
+    except ValueError as e:
+        return [TextContent(type="text", text=str(e))]
+    return await with_deadline(render_job(wf, values, ctx, label=label, options=options), timeout)
+
+
+@mcp.tool()
+async def submit_image_job(
+    prompt: str,
+    ctx: Context,
+    image_format: str | None = None,
+    quality: int | None = None,
+    effort: int | None = None,
+    lossless: bool | None = None,
+    thumbnail: bool | None = None,
+    timeout: float | None = None,
+    workflow: str | None = None,
+    seed: int | None = None,
+    steps: int | None = None,
+    cfg: float | None = None,
+    width: int | None = None,
+    height: int | None = None,
+    batch_size: int | None = None,
+    preview: bool = False,
+    image: str | None = None,
+) -> str:
+    """Start generating an image in the background and return its job id right away
+
+    Takes the same arguments as generate_image. Use this for renders that take longer
+    than a tool call may, or to queue many at once, then collect the images with
+    wait_for_jobs or get_job_result. timeout defaults to COMFY_JOB_TIMEOUT seconds.
+    """
+    try:
+        wf, values, label, options = prepare_job(
+            prompt, image_format, quality, effort, lossless, thumbnail, workflow,
+            seed, steps, cfg, width, height, batch_size, preview, image)
+    except ValueError as e:
+        return str(e)
+    if scheduler.waiting >= scheduler.max_waiting:
+        return f"Server busy ({scheduler.in_flight} jobs running and {scheduler.waiting} waiting), please try again later."
+
+    start_services()
+    job_id = new_job_id()
+    track_job(job_id, render_job(wf, values, BackgroundContext(), label=label, options=options,
+                                 report_progress=False, job_id=job_id, timeout=timeout or job_timeout,
+                                 session=session_id(ctx)))
+    return f"{label}Job id: {job_id}"
+
+
+@mcp.tool()
+async def generate_images(
+    prompts: list[str],
+    ctx: Context,
+    seeds: list[int] | None = None,
+    batch_size: int | None = None,
+    image_format: str | None = None,
+    quality: int | None = None,
+    effort: int | None = None,
+    lossless: bool | None = None,
+    thumbnail: bool | None = None,
+    timeout: float | None = None,
+    workflow: str | None = None,
+    steps: int | None = None,
+    cfg: float | None = None,
+    width: int | None = None,
+    height: int | None = None,
+    preview: bool = False,
+    image: str | None = None,
+) -> list[TextContent | ImageContent]:
+    """Generate images for many prompts in one call
+
+    Every prompt is rendered once per seed (or once with the workflow's seed when no
+    seeds are given), and all renders are queued in ComfyUI at once. batch_size, when
+    given, asks the workflow's latent image node for that many images per render. The image
+    options, workflow, input image and sampler and size overrides work as in generate_image;
+    timeout applies to the whole call, and renders still unfinished by then are cancelled.
+    """
+
+    wf = workflows.get(workflow)
+    if wf is None:
+        return unknown_workflow(workflow)
+    try:
+        # Checked once up front, so a bad override fails the call before anything is queued
+        job_values(wf, "", seeds[0] if seeds else None, steps, cfg, width, height, batch_size, preview, image)
+    except ValueError as e:
+        return [TextContent(type="text", text=str(e))]
+    if image_format is not None and image_format.lower() not in IMAGE_FORMATS:
+        return [TextContent(type="text", text=f"Unsupported image_format, use one of: {', '.join(IMAGE_FORMATS)}")]
+    options = encode_options(image_format, quality, effort, lossless, thumbnail)
+
+    jobs = []
+    for prompt in prompts:
+        for seed in (seeds or [None]):
+            values = job_values(wf, prompt, seed, steps, cfg, width, height, batch_size, preview, image)
+            if seed is not None and seed < 0:
+                seed = values[wf.seed_input]
+            label = f"[{len(jobs) + 1}] {prompt[:60]}" + (f" (seed {seed})" if seed is not None else "")
+            jobs.append((render_job(wf, values, ctx, label=label + "\n", options=options, report_progress=False),
+                         label + "\n"))
+
+    # Collect results as each render finishes rather than in submission order
+    tasks = [asyncio.create_task(reported(job, label)) for job, label in jobs]
+    results = []
+    done = 0
+    try:
+        for task in asyncio.as_completed(tasks, timeout=timeout):
+            results.extend(await task)
+            done += 1
+            await ctx.report_progress(done, len(jobs))
+    except asyncio.TimeoutError:
+        results.append(TextContent(
+            type="text", text=f"Timed out after {timeout:g} seconds, {len(jobs) - done} unfinished jobs were cancelled."))
+    finally:
+        # Cancelled renders take their prompts off ComfyUI
+        for task in tasks:
+            task.cancel()
+    return results
+
+
+if prompt_writer is not None:
+    @mcp.tool()
+    async def generate_images_from_topics(
+        topics: list[str],
+        ctx: Context,
+        image_format: str | None = None,
+        quality: int | None = None,
+        effort: int | None = None,
+        lossless: bool | None = None,
+        thumbnail: bool | None = None,
+        timeout: float | None = None,
+        workflow: str | None = None,
+    ) -> list[TextContent | ImageContent]:
+        """Write a prompt for each topic and render it, all in one call
+
+        Each prompt is sent to ComfyUI as soon as it is written, so the next topic is
+        expanded while earlier ones render. Finished images are reported as progress
+        as they come in. The image options, timeout and workflow work as in generate_images.
+        """
+
+        wf = workflows.get(workflow)
+        if wf is None:
+            return unknown_workflow(workflow)
+        if image_format is not None and image_format.lower() not in IMAGE_FORMATS:
+            return [TextContent(type="text", text=f"Unsupported image_format, use one of: {', '.join(IMAGE_FORMATS)}")]
+        options = encode_options(image_format, quality, effort, lossless, thumbnail)
+
+        results = []
+        done = 0
+
+        async def render(prompt: str, label: str):
+            nonlocal done
+            job_results = await reported(render_job(wf, {wf.prompt_input: prompt}, ctx, label=label,
+                                                    options=options, report_progress=False), label)
+            results.extend(job_results)
+            done += 1
+            await ctx.report_progress(done, len(topics), "\n\n".join(r.text for r in job_results if r.type == "text"))
+
+        async def pipeline():
+            nonlocal done
+            renders = []
+            try:
+                # One topic at a time: Ollama serves requests in turn, so expanding in parallel gains nothing
+                for i, topic in enumerate(topics, start=1):
+                    label = f"[{i}] {topic[:60]}"
+                    try:
+                        prompt = await prompt_writer.write(topic)
+                    except Exception as e:
+                        results.append(TextContent(type="text", text=f"{label}\nFailed to write a prompt: {e}"))
+                        done += 1
+                        continue
+                    await ctx.info(f"{label}: prompt written, rendering")
+                    renders.append(asyncio.create_task(render(prompt, f"{label}\nPrompt: {prompt}\n")))
+                await asyncio.gather(*renders)
+            finally:
+                # Don't leave renders running if the call itself is cancelled or runs out of time
+                for task in renders:
+                    task.cancel()
+
+        try:
+            await asyncio.wait_for(pipeline(), timeout)
+        except asyncio.TimeoutError:
+            results.append(TextContent(
+                type="text", text=f"Timed out after {timeout:g} seconds, {len(topics) - done} unfinished topics were cancelled."))
+        return results
+
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def upload_path(path: str) -> str:
+    """Resolve a path given to upload_image, raising ValueError if this server may not read it"""
+    if upload_dir is None:
+        if mcp_transport != "stdio":
+            raise ValueError("Uploading by path is off for network clients, send the image as data instead.")
+        return path
+    root = os.path.realpath(upload_dir)
+    # Relative paths are taken from the folder, and links out of it are followed before checking
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError("Only files in COMFY_UPLOAD_DIR can be uploaded by path.")
+    return resolved
+
+
+@mcp.tool()
+async def upload_image(path: str | None = None, data: str | None = None, filename: str | None = None) -> str:
+    """Upload an input image for image-to-image workflows and get a handle for generate_image
+
+    Give either a local file path or the image as base64 data. Paths are limited to
+    COMFY_UPLOAD_DIR when it's set, and need it over SSE and streamable HTTP. The same
+    image always gets the same handle, and is sent to each ComfyUI server only once.
+    """
+    if (path is None) == (data is None):
+        return "Give either path or data."
+    try:
+        if path is not None:
+            raw = await asyncio.to_thread(read_file, upload_path(path))
+        else:
+            raw = base64.b64decode(data, validate=True)
+    except (OSError, binascii.Error) as e:
+        return f"Could not read the image: {e}"
+    except ValueError as e:
+        return str(e)
+    name = input_images.add(raw, filename or path or "")
+
+    # Send it to the backend the next job will most likely go to, so problems show up now
+    backends.start()
+    try:
+        await input_images.ensure(backends.ranked()[0].client, name)
+    except (httpx.HTTPError, RuntimeError) as e:
+        return f"Stored as {name}, but uploading it to ComfyUI failed: {e}"
+    return f"Image handle: {name}\nPass image=\"{name}\" to generate_image."
+
+
+@mcp.tool()
+async def get_job_result(ctx: Context, job_id: str | None = None) -> list[TextContent | ImageContent]:
+    """Collect the images of an earlier job by its id, or list recent jobs when no id is given
+
+    Jobs are kept across server restarts, so a render that outlived its tool call can
+    still be picked up once ComfyUI has finished it. The list only shows this client's jobs.
+    """
+
+    if job_id is None:
+        lines = [
+            f"{job_id}  {job.get('status')}  {datetime.fromtimestamp(job.get('created', 0)):%Y-%m-%d %H:%M:%S}  {job.get('label', '')[:60]}"
+            for job_id, job in journal.recent(session=session_id(ctx))
+        ]
+        return [TextContent(type="text", text="\n".join(lines) or "No jobs yet.")]
+
+    start_services()
+    return await job_result(job_id, ctx)
+
+
+def job_status(job_id: str, job: dict | None) -> dict:
+    if job is None:
+        return {"id": job_id, "status": QUEUED if job_id in job_tasks else "unknown"}
+    status = {
+        "id": job_id,
+        "status": job["status"],
+        "workflow": job.get("workflow"),
+        "label": job.get("label"),
+        "created": datetime.fromtimestamp(job["created"]).isoformat(timespec="seconds") if "created" in job else None,
+        "elapsed": round(job["updated"] - job["created"], 1) if "created" in job else None,
+    }
+    if job["status"] == SUBMITTED:
+        backend = backend_for(job.get("backend"))
+        listener = backend.client.listener if backend is not None else None
+        state = listener.peek(job["prompt_id"]) if listener is not None else None
+        if state is not None:
+            status["started"] = state.started
+            if state.progress is not None:
+                status["progress"] = f"{state.progress[1]}/{state.progress[2]}"
+    elif job["status"] == DONE:
+        status["images"] = [image["local_path"] or image["remote_url"] for image in job["images"]]
+    elif job["status"] == FAILED:
+        status["error"] = job.get("error")
+    return status
+
+
+@mcp.tool()
+def get_job_status(ctx: Context, job_ids: list[str] | None = None) -> str:
+    """Report the state of jobs by id without waiting, or of the most recent jobs when no ids are given"""
+    if job_ids is None:
+        recent = journal.recent(session=session_id(ctx))
+        return json.dumps([job_status(job_id, job) for job_id, job in recent], indent=2)
+    if any(journal.get(job_id) is not None and journal.get(job_id).get("owner") != journal.owner
+           for job_id in job_ids):
+        # Another server's jobs may have moved on since the journal was read
+        journal.refresh()
+    return json.dumps([job_status(job_id, journal.get(job_id)) for job_id in job_ids], indent=2)
+
+
+@mcp.tool()
+async def wait_for_jobs(job_ids: list[str], ctx: Context, timeout: float = 60) -> list[TextContent | ImageContent]:
+    """Wait up to timeout seconds for jobs to finish and return the images of every finished one
+
+    Jobs still running when the time is up are reported with their state; call again
+    to keep waiting. Cancelling this call leaves the jobs running.
+    """
+    start_services()
+    pending = set()
+    for job_id in job_ids:
+        # A job that was just submitted may not have reached the journal yet
+        task = follow_job(job_id) if journal.get(job_id) is not None else job_tasks.get(job_id)
+        if task is not None:
+            pending.add(task)
+
+    total = len(pending)
+    deadline = time.monotonic() + timeout
+    while pending and (remaining := deadline - time.monotonic()) > 0:
+        # Waiting doesn't cancel the jobs when the time runs out or this call is cancelled
+        done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        if done:
+            await ctx.report_progress(total - len(pending), total, f"{total - len(pending)} of {total} jobs finished")
+
+    results = []
+    for job_id in job_ids:
+        results.extend(await job_result(job_id, ctx))
+    return results
+
+
+@mcp.tool()
+def list_workflows() -> str:
+    """List the workflows generate_image can use, with the nodes each request fills in"""
+    return json.dumps({
+        "default": workflows.default_name,
+        "workflows": [wf.describe() for wf in workflows.workflows()],
+        "errors": workflows.errors(),
+    }, indent=2)
+
+
+@mcp.tool()
+def server_stats(format: str = "json") -> str:
+    """Report the load and error counts of each ComfyUI backend, how long each stage of a job takes and how well history polling keeps up
+
+    Stage timings are in seconds. format "prometheus" returns the timings and counters
+    in the Prometheus text format instead.
+    """
+    if format == "prometheus":
+        return metrics.prometheus()
+    return json.dumps({
+        "backends": [
+            dict(backend, counters=metrics.backend_counters(backend["server"]))
+            for backend in backends.stats()
+        ],
+        "stages": metrics.stats(),
+        "polling": poll_stats.stats(),
+    }, indent=2)
+
+
+@mcp.tool()
+def cache_stats() -> str:
+    """Report hit/miss counters and size of the generated image and prompt caches, renders shared by identical requests, and input image reuse"""
+    stats = {
+        "images": dict(result_cache.stats(), enabled=True) if result_cache is not None else {"enabled": False},
+        "shared_renders": in_flight.stats(),
+    }
+    if prompt_writer is not None:
+        stats["prompts"] = prompt_writer.stats()
+    stats["input_images"] = input_images.stats()
+    return json.dumps(stats, indent=2)
+
+
+def run_server():
+    errors = []
+    if host is None:
+        errors.append("- COMFY_URL environment variable not set")
+    if workflow is None and workflow_dir is None:
+        errors.append(
+            "- COMFY_WORKFLOW_JSON_FILE or COMFY_WORKFLOW_DIR environment variable not set")
+    elif workflows.get() is None:
+        errors.append("- No usable workflow found")
+        errors.extend(f"  {name}: {error}" for name, error in workflows.errors().items())
+
+    if mcp_transport not in ("stdio", "sse", "streamable-http"):
+        errors.append(f"- Unknown COMFY_MCP_TRANSPORT {mcp_transport}, use stdio, sse or streamable-http")
+
+    if len(errors) > 0:
+        errors = ["Failed to start Comfy MCP Server:"] + errors
+        sys.stderr.write("\n".join(errors) + "\n")
+        sys.exit(1)
+    else:
+        # Encoder workers import this package too; start them while we wait for the first call
+        encoder.warm()
+        if mcp_transport != "stdio":
+            path = mcp.settings.sse_path if mcp_transport == "sse" else mcp.settings.streamable_http_path
+            sys.stderr.write(f"Comfy MCP Server listening on http://{mcp_host}:{mcp_port}{path}\n")
+        if mcp_transport == "stdio":
+            anyio.run(run_transport, run_stdio)
+        else:
+            anyio.run(run_transport, run_http, mcp_transport)
+
+
+if __name__ == "__main__":
+    run_server()
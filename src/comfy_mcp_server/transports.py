@@ -0,0 +1,46 @@
+from typing import Callable
+
+import anyio
+from mcp.server.fastmcp import FastMCP
+from mcp.server.stdio import stdio_server
+
+
+async def run_stdio(mcp: FastMCP, on_shutdown: Callable[[], None]):
+    """Serve over stdio like FastMCP.run, calling on_shutdown once the client closes stdin
+
+    When its input ends, the MCP server cancels every request it is still handling, just
+    as if the client had cancelled them. on_shutdown runs before that, so tools can tell
+    the two apart.
+    """
+    async with stdio_server() as (read_stream, write_stream):
+        send, receive = anyio.create_memory_object_stream(0)
+
+        async def forward():
+            async with send:
+                try:
+                    async for message in read_stream:
+                        await send.send(message)
+                finally:
+                    on_shutdown()
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(forward)
+            # FastMCP.run_stdio_async does the same with the stream straight from stdin
+            server = mcp._mcp_server
+            await server.run(receive, write_stream, server.create_initialization_options())
+            tg.cancel_scope.cancel()
+
+
+async def run_http(mcp: FastMCP, transport: str, on_shutdown: Callable[[], None]):
+    """Serve over SSE or streamable HTTP like FastMCP.run, calling on_shutdown when asked to exit"""
+    import uvicorn
+
+    class Server(uvicorn.Server):
+        def handle_exit(self, sig, frame):
+            on_shutdown()
+            super().handle_exit(sig, frame)
+
+    app = mcp.sse_app() if transport == "sse" else mcp.streamable_http_app()
+    await Server(uvicorn.Config(
+        app, host=mcp.settings.host, port=mcp.settings.port, log_level=mcp.settings.log_level.lower(),
+    )).serve()
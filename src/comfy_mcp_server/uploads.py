@@ -0,0 +1,100 @@
+import asyncio
+import hashlib
+import json
+import os
+
+from .client import ComfyClient
+from .locking import file_lock
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif")
+
+
+class InputImages:
+    """Input images kept locally under content-hash names, uploaded to each ComfyUI at most once
+
+    The index of which backend already has which image survives restarts; an entry is
+    checked against the backend once per process before it's trusted. Servers sharing
+    the directory merge their additions into it under a file lock.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "uploads.json")
+        self.uploads = 0
+        self.reused = 0
+        self._index = self._load()
+        self._verified = set()
+        self._locks = {}
+
+    def _load(self) -> dict:
+        try:
+            with open(self.index_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        with file_lock(f"{self.index_path}.lock"):
+            # Keep what other processes uploaded since the index was read
+            index = self._load()
+            for name, servers in self._index.items():
+                known = index.setdefault(name, [])
+                known.extend(server for server in servers if server not in known)
+            self._index = index
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self.index_path)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def __contains__(self, name: str) -> bool:
+        return os.path.basename(name) == name and os.path.isfile(self.path(name))
+
+    def add(self, data: bytes, filename: str = "") -> str:
+        """Store image bytes and return their handle, the same for the same content"""
+        ext = os.path.splitext(filename)[1].lower()
+        if ext not in IMAGE_EXTENSIONS:
+            ext = ".png"
+        name = f"mcp_{hashlib.sha256(data).hexdigest()[:24]}{ext}"
+        if name not in self:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self.path(name)}.part"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path(name))
+        return name
+
+    async def ensure(self, comfy: ComfyClient, name: str):
+        """Make sure a backend has the image in its input folder, uploading it only if needed"""
+        key = (comfy.server, name)
+        if key in self._verified:
+            self.reused += 1
+            return
+        # Concurrent jobs using the same image wait for one upload instead of each sending it
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            if key in self._verified:
+                self.reused += 1
+                return
+            if comfy.server in self._index.get(name, []) and await comfy.has_input(name):
+                self._verified.add(key)
+                self.reused += 1
+                return
+            stored = await comfy.upload_image(self.path(name), name)
+            if stored != name:
+                raise RuntimeError(f"ComfyUI at {comfy.server} did not accept input image {name}")
+            self._index.setdefault(name, [])
+            if comfy.server not in self._index[name]:
+                self._index[name].append(comfy.server)
+            self._save()
+            self._verified.add(key)
+            self.uploads += 1
+
+    def stats(self) -> dict:
+        return {
+            "images": len(self._index),
+            "uploads": self.uploads,
+            "reused": self.reused,
+        }
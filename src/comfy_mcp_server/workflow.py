@@ -0,0 +1,232 @@
+import json
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Any
+
+# A splice point names one node input that may change per request
+SplicePoint = tuple[str, str]
+
+# Which input holds the seed / batch size / steps / cfg, by node class_type
+SEED_INPUTS = {
+    "KSampler": "seed",
+    "KSamplerAdvanced": "noise_seed",
+    "RandomNoise": "noise_seed",
+}
+BATCH_INPUTS = {
+    "EmptySD3LatentImage": "batch_size",
+    "EmptyLatentImage": "batch_size",
+    "EmptyHunyuanLatentVideo": "batch_size",
+}
+STEPS_INPUTS = {
+    "KSampler": "steps",
+    "KSamplerAdvanced": "steps",
+    "BasicScheduler": "steps",
+}
+CFG_INPUTS = {
+    "KSampler": "cfg",
+    "KSamplerAdvanced": "cfg",
+    "CFGGuider": "cfg",
+}
+PROMPT_INPUTS = {
+    "CLIPTextEncode": "text",
+}
+IMAGE_INPUTS = {
+    "LoadImage": "image",
+}
+# Nodes whose images are returned, most preferred first
+OUTPUT_CLASSES = ("SaveImage", "PreviewImage")
+
+
+def load_graph(path: str) -> dict:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def node_order(graph: dict) -> list[str]:
+    # Node ids are numeric strings in exported workflows; walk them in numeric order
+    return sorted(graph, key=lambda n: (len(n), n))
+
+
+def literal_input(graph: dict, node_id: str, name: str | None) -> SplicePoint | None:
+    inputs = graph.get(node_id, {}).get('inputs', {})
+    # Inputs wired to another node are lists, only literal values can be overridden
+    if name is not None and name in inputs and not isinstance(inputs[name], list):
+        return node_id, name
+    return None
+
+
+def find_input(graph: dict, inputs_by_class: dict[str, str]) -> SplicePoint | None:
+    """Locate the first node whose class_type is listed, returning it with its input name"""
+    for node_id in node_order(graph):
+        point = literal_input(graph, node_id, inputs_by_class.get(graph[node_id].get('class_type')))
+        if point is not None:
+            return point
+    return None
+
+
+def find_node(graph: dict, classes: tuple[str, ...]) -> str | None:
+    """Locate the first node of the most preferred class_type present"""
+    for class_type in classes:
+        for node_id in node_order(graph):
+            if graph[node_id].get('class_type') == class_type:
+                return node_id
+    return None
+
+
+def find_prompt_input(graph: dict) -> SplicePoint | None:
+    """Locate the positive prompt text by following a sampler's positive input upstream
+
+    Falls back to the first text encoder, for workflows without a positive input.
+    """
+    for node_id in node_order(graph):
+        link = graph[node_id].get('inputs', {}).get('positive')
+        if not isinstance(link, list):
+            continue
+        # Breadth first, so the nearest encoder wins over one feeding e.g. a conditioning combine further up
+        pending = [str(link[0])]
+        seen = set()
+        while pending:
+            upstream = pending.pop(0)
+            if upstream in seen or upstream not in graph:
+                continue
+            seen.add(upstream)
+            point = literal_input(graph, upstream, PROMPT_INPUTS.get(graph[upstream].get('class_type')))
+            if point is not None:
+                return point
+            pending.extend(str(value[0]) for value in graph[upstream].get('inputs', {}).values()
+                           if isinstance(value, list))
+    return find_input(graph, PROMPT_INPUTS)
+
+
+class WorkflowTemplate:
+    """Workflow serialized once up front, with per-request inputs spliced into the JSON text
+
+    The loaded graph is never mutated, so concurrent requests can't see each other's
+    values, and a request costs one string join instead of a deep copy plus json.dumps
+    over the whole graph.
+    """
+
+    def __init__(self, graph: dict, splice_points: list[SplicePoint]):
+        self.splice_points = tuple(dict.fromkeys(splice_points))
+        self.defaults = {
+            (node_id, name): graph[node_id]['inputs'].get(name)
+            for node_id, name in self.splice_points
+        }
+
+        # Serialize once with a unique marker in place of every splice point, then cut the text there
+        marker = f"@@splice-{uuid.uuid4().hex}-"
+        staged = dict(graph)
+        for i, (node_id, name) in enumerate(self.splice_points):
+            if staged[node_id] is graph[node_id]:
+                staged[node_id] = dict(graph[node_id], inputs=dict(graph[node_id]['inputs']))
+            staged[node_id]['inputs'][name] = f"{marker}{i}"
+
+        self._fragments = []
+        self._order = []
+        text = json.dumps(staged)
+        quoted_marker = f'"{marker}'
+        while True:
+            start = text.find(quoted_marker)
+            if start < 0:
+                break
+            end = text.index('"', start + len(quoted_marker))
+            self._fragments.append(text[:start])
+            self._order.append(self.splice_points[int(text[start + len(quoted_marker):end])])
+            text = text[end + 1:]
+        self._fragments.append(text)
+
+    def render(self, values: dict[SplicePoint, Any] | None = None) -> str:
+        """Return the workflow as JSON text with the given values applied"""
+        values = values or {}
+        parts = [self._fragments[0]]
+        for point, fragment in zip(self._order, self._fragments[1:]):
+            parts.append(json.dumps(values.get(point, self.defaults[point])))
+            parts.append(fragment)
+        return "".join(parts)
+
+
+@dataclass(frozen=True)
+class CompiledWorkflow:
+    """A workflow template together with the node inputs a request can set"""
+
+    name: str
+    path: str
+    template: WorkflowTemplate
+    output_node_id: str
+    prompt_input: SplicePoint
+    seed_input: SplicePoint | None = None
+    steps_input: SplicePoint | None = None
+    cfg_input: SplicePoint | None = None
+    batch_input: SplicePoint | None = None
+    # Width and height of the latent image node, when both are literal values
+    size_inputs: tuple[SplicePoint, SplicePoint] | None = None
+    # File name input of the LoadImage node, for image-to-image workflows
+    image_input: SplicePoint | None = None
+
+    def describe(self) -> dict:
+        return {
+            "name": self.name,
+            "path": self.path,
+            "prompt_node_id": self.prompt_input[0],
+            "output_node_id": self.output_node_id,
+            "seed_node_id": self.seed_input[0] if self.seed_input else None,
+            "steps": self.template.defaults[self.steps_input] if self.steps_input else None,
+            "cfg": self.template.defaults[self.cfg_input] if self.cfg_input else None,
+            "width": self.template.defaults[self.size_inputs[0]] if self.size_inputs else None,
+            "height": self.template.defaults[self.size_inputs[1]] if self.size_inputs else None,
+            "batch": self.batch_input is not None,
+            "image_node_id": self.image_input[0] if self.image_input else None,
+        }
+
+
+def compile_workflow(name: str, path: str, prompt_node_id: str | None = None,
+                     output_node_id: str | None = None) -> CompiledWorkflow:
+    """Load a workflow and find its prompt, output, sampler, size, batch and input image nodes by class_type
+
+    Node ids given explicitly take precedence over the detected ones.
+    """
+    graph = load_graph(path)
+
+    if prompt_node_id is not None:
+        if prompt_node_id not in graph:
+            raise ValueError(f"prompt node {prompt_node_id} not found in {os.path.basename(path)}")
+        prompt_input = (prompt_node_id, 'text')
+    else:
+        prompt_input = find_prompt_input(graph)
+        if prompt_input is None:
+            raise ValueError(f"no CLIPTextEncode node with a text prompt in {os.path.basename(path)}")
+
+    if output_node_id is None:
+        output_node_id = find_node(graph, OUTPUT_CLASSES)
+    if output_node_id is None or output_node_id not in graph:
+        raise ValueError(f"no image output node found in {os.path.basename(path)}")
+
+    seed_input = find_input(graph, SEED_INPUTS)
+    steps_input = find_input(graph, STEPS_INPUTS)
+    cfg_input = find_input(graph, CFG_INPUTS)
+    batch_input = find_input(graph, BATCH_INPUTS)
+    size_inputs = None
+    if batch_input is not None:
+        width = literal_input(graph, batch_input[0], 'width')
+        height = literal_input(graph, batch_input[0], 'height')
+        if width is not None and height is not None:
+            size_inputs = (width, height)
+
+    image_input = find_input(graph, IMAGE_INPUTS)
+
+    splice_points = [prompt_input, seed_input, steps_input, cfg_input, batch_input, image_input,
+                     *(size_inputs or ())]
+    return CompiledWorkflow(
+        name=name,
+        path=path,
+        template=WorkflowTemplate(graph, [point for point in splice_points if point is not None]),
+        output_node_id=output_node_id,
+        prompt_input=prompt_input,
+        seed_input=seed_input,
+        steps_input=steps_input,
+        cfg_input=cfg_input,
+        batch_input=batch_input,
+        size_inputs=size_inputs,
+        image_input=image_input,
+    )
@@ -0,0 +1,102 @@
+"""Run the bench stubs inside a test's event loop and the MCP server from this checkout over stdio"""
+
+import asyncio
+import os
+import socket
+import sys
+from contextlib import asynccontextmanager
+
+import uvicorn
+from mcp import ClientSession, StdioServerParameters, types
+from mcp.client.stdio import stdio_client
+
+from stub_comfyui import StubComfyUI
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKFLOW = os.path.join(ROOT, "workflow", "image_z_image_turbo.json")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_stub(latency: float = 0.2, steps: int = 10, workers: int = 1, stub_class=StubComfyUI,
+              **kwargs) -> StubComfyUI:
+    """A stub ComfyUI with small images and no jitter, so timings in tests are predictable"""
+    options = dict(jitter=0.0, failure_rate=0.0, width=64, height=64)
+    options.update(kwargs)
+    return stub_class(latency=latency, steps=steps, workers=workers, **options)
+
+
+@asynccontextmanager
+async def serve(app):
+    """Serve an ASGI app on a free local port for the duration of the block"""
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning", timeout_graceful_shutdown=1))
+    task = asyncio.get_running_loop().create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        await task
+
+
+@asynccontextmanager
+async def mcp_session(comfy_url: str, save_dir: str, **env):
+    """A client session with a fresh MCP server process"""
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [os.path.join(ROOT, "src"), os.environ.get("PYTHONPATH")])),
+        COMFY_URL=comfy_url,
+        COMFY_WORKFLOW_JSON_FILE=WORKFLOW,
+        COMFY_LOCAL_SAVE_DIR=save_dir,
+        COMFY_CACHE="false",
+        **env,
+    )
+    server = StdioServerParameters(command=sys.executable, args=["-m", "comfy_mcp_server"], env=env)
+    with open(os.devnull, "w") as errlog:
+        async with stdio_client(server, errlog=errlog) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                yield session
+
+
+async def quit_server(session: ClientSession, grace: float = 1.0):
+    """Close the server's stdin as a client does when it quits, and give the server time to exit
+
+    Leaving the session with a call in flight closes stdin only once the client has stopped
+    reading, so whatever the server still writes would hit a closed stream.
+    """
+    await session._write_stream.aclose()
+    await asyncio.sleep(grace)
+
+
+def start_call(session: ClientSession, name: str, arguments: dict) -> tuple[asyncio.Task, int]:
+    """Call a tool in the background, returning the task and the request id to cancel it by"""
+    request_id = session._request_id
+    return asyncio.get_running_loop().create_task(session.call_tool(name, arguments)), request_id
+
+
+async def cancel_call(session: ClientSession, request_id: int):
+    """Cancel a call the way an MCP client does, with a notifications/cancelled message"""
+    await session.send_notification(types.ClientNotification(types.CancelledNotification(
+        params=types.CancelledNotificationParams(requestId=request_id, reason="test"))))
+
+
+async def wait_until(condition, timeout: float = 10.0, interval: float = 0.02):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(interval)
+
+
+def text(result) -> str:
+    return "\n".join(item.text for item in result.content if item.type == "text")
@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+
+from comfy_mcp_server.backends import Backend, BackendPool
+from comfy_mcp_server.polling import RenderTimes
+
+
+def make_pool(*names: str) -> tuple[BackendPool, RenderTimes]:
+    render_times = RenderTimes()
+    backends = [Backend(SimpleNamespace(server=name)) for name in names]
+    return BackendPool(backends, health_interval=0, render_times=render_times), render_times
+
+
+def test_routing_uses_the_render_times_polling_learns_per_workflow():
+    pool, render_times = make_pool("a", "b")
+    render_times.record(("a", "portrait"), 2.0)
+    render_times.record(("b", "portrait"), 5.0)
+    render_times.record(("b", "sketch"), 1.0)
+
+    assert [b.name for b in pool.ranked("portrait")] == ["a", "b"]
+    # a never ran a sketch, so its average across workflows stands in
+    assert [b.name for b in pool.ranked("sketch")] == ["b", "a"]
+    assert pool.stats()[1]["render_times"] == {"portrait": 5.0, "sketch": 1.0}
+
+
+def test_backends_without_render_times_use_the_default():
+    pool, render_times = make_pool("a", "b")
+    render_times.record(("a", "portrait"), 30.0)
+    pool.backends[1].queue_depth = 1
+
+    # Two jobs at the 10 second default beat one at 30
+    assert [b.name for b in pool.ranked("portrait")] == ["b", "a"]
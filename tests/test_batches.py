@@ -0,0 +1,48 @@
+import asyncio
+
+from stub_comfyui import StubComfyUI
+from stub_ollama import StubOllama
+
+from helpers import make_stub, mcp_session, serve, text
+
+
+class StalledImageStub(StubComfyUI):
+    """Never answers for the first prompt's image, as a ComfyUI that hangs on /view"""
+
+    async def view(self, request):
+        if request.query_params.get("filename", "").startswith("stub_00001_"):
+            await asyncio.sleep(3)
+        return await super().view(request)
+
+
+def test_a_failed_render_keeps_the_rest_of_the_batch(tmp_path):
+    async def run():
+        stub = make_stub(latency=0.2, stub_class=StalledImageStub)
+        async with serve(stub.app()) as url:
+            env = dict(COMFY_HTTP_TIMEOUT="0.5", COMFY_HTTP_RETRIES="0")
+            async with mcp_session(url, str(tmp_path), COMFY_MAX_IN_FLIGHT="1", **env) as session:
+                result = await session.call_tool("generate_images", {"prompts": ["a lighthouse", "a harbour"]})
+        return stub, text(result)
+
+    stub, result = asyncio.run(run())
+    assert "[1] a lighthouse\nFailed: ReadTimeout" in result
+    assert "[2] a harbour" in result
+    assert "Image generated successfully" in result
+    assert stub.stats["completed"] == 2
+
+
+def test_a_failed_render_keeps_the_rest_of_the_topics(tmp_path):
+    async def run():
+        stub = make_stub(latency=0.2, stub_class=StalledImageStub)
+        ollama = StubOllama(latency=0.0, token_delay=0.0)
+        async with serve(stub.app()) as url, serve(ollama.app()) as ollama_url:
+            env = dict(COMFY_HTTP_TIMEOUT="0.5", COMFY_HTTP_RETRIES="0", OLLAMA_API_BASE=ollama_url, PROMPT_LLM="stub")
+            async with mcp_session(url, str(tmp_path), COMFY_MAX_IN_FLIGHT="1", **env) as session:
+                result = await session.call_tool("generate_images_from_topics", {"topics": ["a lighthouse", "a harbour"]})
+        return stub, text(result)
+
+    stub, result = asyncio.run(run())
+    assert "Failed: ReadTimeout" in result
+    assert "[2] a harbour" in result
+    assert "Image generated successfully" in result
+    assert stub.stats["completed"] == 2
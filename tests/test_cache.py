@@ -0,0 +1,67 @@
+import os
+
+from comfy_mcp_server.cache import ResultCache
+
+
+def saved_image(tmp_path, name: str, size: int = 100) -> dict:
+    path = tmp_path / name
+    path.write_bytes(b"x" * size)
+    return {"local_path": str(path), "remote_url": f"http://comfy/view?filename={name}", "original_size_kb": 1.0}
+
+
+def test_hits_do_not_rewrite_the_index(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=10_000, max_age=3600)
+    cache.put("a", [saved_image(tmp_path, "a.webp")])
+    index = tmp_path / "cache" / "index.json"
+    written = index.stat().st_mtime_ns
+    os.utime(index, ns=(written - 10**9, written - 10**9))
+
+    for _ in range(5):
+        assert cache.get("a")[0]["remote_url"].endswith("a.webp")
+    assert index.stat().st_mtime_ns == written - 10**9
+    assert cache.stats()["hits"] == 5
+
+
+def test_recency_from_hits_is_saved_with_the_next_put(tmp_path):
+    directory = str(tmp_path / "cache")
+    cache = ResultCache(directory, max_bytes=250, max_age=3600)
+    cache.put("a", [saved_image(tmp_path, "a.webp")])
+    cache.put("b", [saved_image(tmp_path, "b.webp")])
+    cache.get("a")
+    # Over budget: b is now the least recently used and goes
+    cache.put("c", [saved_image(tmp_path, "c.webp")])
+    assert set(cache.entries) == {"a", "c"}
+
+    reopened = ResultCache(directory, max_bytes=250, max_age=3600)
+    assert set(reopened.entries) == {"a", "c"}
+    assert reopened.entries["a"]["last_used"] == cache.entries["a"]["last_used"]
+
+
+def test_servers_sharing_the_cache_keep_each_others_entries(tmp_path):
+    directory = str(tmp_path / "cache")
+    first = ResultCache(directory, max_bytes=250, max_age=3600)
+    second = ResultCache(directory, max_bytes=250, max_age=3600)
+    assert first.entries == second.entries == {}
+    first.put("a", [saved_image(tmp_path, "a.webp")])
+    second.put("b", [saved_image(tmp_path, "b.webp")])
+    first.get("a")
+    # Over budget across both: b is the least recently used, even though this process never saw it
+    first.put("c", [saved_image(tmp_path, "c.webp")])
+
+    reopened = ResultCache(directory, max_bytes=250, max_age=3600)
+    assert set(reopened.entries) == {"a", "c"}
+    assert sorted(os.listdir(directory)) == ["a_0.webp", "c_0.webp", "index.json", "index.lock"]
+
+
+def test_files_no_entry_refers_to_are_removed(tmp_path):
+    directory = tmp_path / "cache"
+    directory.mkdir()
+    # Left behind by a process whose index update was lost
+    orphan = directory / f"{'0' * 64}_0.webp"
+    orphan.write_bytes(b"x" * 100)
+    key = "1" * 64
+    cache = ResultCache(str(directory), max_bytes=10_000, max_age=3600)
+    cache.put(key, [saved_image(tmp_path, "a.webp")])
+
+    assert not orphan.exists()
+    assert (directory / f"{key}_0.webp").exists()
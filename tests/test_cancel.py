@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+import pytest
+from mcp.shared.exceptions import McpError
+
+from helpers import cancel_call, make_stub, mcp_session, serve, start_call, text, wait_until
+
+
+async def wait_for_joiners(session, count: int):
+    """Wait until count calls wait on an identical render already in progress"""
+    for _ in range(200):
+        # Sleeping first lets calls just started send their request before this one takes the next id
+        await asyncio.sleep(0.02)
+        stats = json.loads(text(await session.call_tool("cache_stats", {})))
+        if stats["shared_renders"]["waiting"] == count:
+            return
+    raise AssertionError("no call joined the render")
+
+
+def test_cancelled_call_is_dropped_from_the_queue(tmp_path):
+    async def run():
+        stub = make_stub(latency=2)
+        async with serve(stub.app()) as url:
+            async with mcp_session(url, str(tmp_path)) as session:
+                first, _ = start_call(session, "generate_image", {"prompt": "a lighthouse"})
+                await wait_until(lambda: stub.running)
+                second, request_id = start_call(session, "generate_image", {"prompt": "a harbour"})
+                await wait_until(lambda: stub.pending)
+                await cancel_call(session, request_id)
+                with pytest.raises(McpError):
+                    await second
+                await wait_until(lambda: stub.stats["deleted"] == 1)
+                return stub, text(await first)
+
+    stub, result = asyncio.run(run())
+    assert "Image generated successfully" in result
+    assert stub.stats["interrupted"] == 0
+    assert stub.stats["completed"] == 1
+
+
+def test_cancelled_call_interrupts_its_render(tmp_path):
+    async def run():
+        stub = make_stub(latency=2)
+        async with serve(stub.app()) as url:
+            async with mcp_session(url, str(tmp_path)) as session:
+                call, request_id = start_call(session, "generate_image", {"prompt": "a lighthouse"})
+                await wait_until(lambda: stub.running)
+                await cancel_call(session, request_id)
+                with pytest.raises(McpError):
+                    await call
+                await wait_until(lambda: stub.stats["interrupted"] == 1)
+        return stub
+
+    stub = asyncio.run(run())
+    assert stub.stats["deleted"] == 0
+    assert stub.stats["completed"] == 0
+
+
+def test_timeout_cancels_the_render(tmp_path):
+    async def run():
+        stub = make_stub(latency=3)
+        async with serve(stub.app()) as url:
+            async with mcp_session(url, str(tmp_path)) as session:
+                result = text(await session.call_tool("generate_image", {"prompt": "a lighthouse", "timeout": 0.5}))
+                await wait_until(lambda: stub.stats["interrupted"] == 1)
+        return stub, result
+
+    stub, result = asyncio.run(run())
+    assert "Timed out after 0.5 seconds" in result
+    assert stub.stats["completed"] == 0
+
+
+def test_a_cancelled_render_is_left_to_an_identical_request(tmp_path):
+    async def run():
+        stub = make_stub(latency=2)
+        async with serve(stub.app()) as url:
+            async with mcp_session(url, str(tmp_path)) as session:
+                leader, request_id = start_call(session, "generate_image", {"prompt": "a lighthouse"})
+                await wait_until(lambda: stub.running)
+                follower, _ = start_call(session, "generate_image", {"prompt": "a lighthouse"})
+                await wait_for_joiners(session, 1)
+                await cancel_call(session, request_id)
+                with pytest.raises(McpError):
+                    await leader
+                return stub, text(await follower)
+
+    stub, result = asyncio.run(run())
+    assert "Image generated successfully" in result
+    assert stub.stats["prompts"] == 1
+    assert stub.stats["interrupted"] == 0
+    assert stub.stats["completed"] == 1
+
+
+def test_a_handed_over_render_is_cancelled_once_nobody_waits(tmp_path):
+    async def run():
+        stub = make_stub(latency=2)
+        async with serve(stub.app()) as url:
+            async with mcp_session(url, str(tmp_path)) as session:
+                leader, leader_id = start_call(session, "generate_image", {"prompt": "a lighthouse"})
+                await wait_until(lambda: stub.running)
+                follower, follower_id = start_call(session, "generate_image", {"prompt": "a lighthouse"})
+                await wait_for_joiners(session, 1)
+                await cancel_call(session, leader_id)
+                await cancel_call(session, follower_id)
+                for call in (leader, follower):
+                    with pytest.raises(McpError):
+                        await call
+                await wait_until(lambda: stub.stats["interrupted"] == 1)
+        return stub
+
+    stub = asyncio.run(run())
+    assert stub.stats["prompts"] == 1
+    assert stub.stats["completed"] == 0
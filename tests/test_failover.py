@@ -0,0 +1,42 @@
+import asyncio
+
+from helpers import free_port, make_stub, mcp_session, serve, text
+from stub_comfyui import StubComfyUI
+
+
+class SlowAnswerStub(StubComfyUI):
+    """Queues the prompt, then answers too late for the client's read timeout"""
+
+    async def post_prompt(self, request):
+        response = await super().post_prompt(request)
+        await asyncio.sleep(2)
+        return response
+
+
+def test_prompt_goes_to_the_next_backend_when_one_cannot_be_reached(tmp_path):
+    async def run():
+        stub = make_stub(latency=0.1)
+        dead = f"http://127.0.0.1:{free_port()}"
+        async with serve(stub.app()) as url:
+            async with mcp_session(f"{dead},{url}", str(tmp_path), COMFY_HTTP_RETRIES="0") as session:
+                return stub, text(await session.call_tool("generate_image", {"prompt": "a lighthouse"}))
+
+    stub, result = asyncio.run(run())
+    assert "Image generated successfully" in result
+    assert stub.stats["prompts"] == 1
+
+
+def test_prompt_is_not_sent_again_after_a_read_timeout(tmp_path):
+    async def run():
+        slow = make_stub(latency=0.1, stub_class=SlowAnswerStub)
+        other = make_stub(latency=0.1)
+        async with serve(slow.app()) as slow_url, serve(other.app()) as other_url:
+            env = dict(COMFY_HTTP_TIMEOUT="0.5", COMFY_HEALTH_INTERVAL="30")
+            async with mcp_session(f"{slow_url},{other_url}", str(tmp_path), **env) as session:
+                result = text(await session.call_tool("generate_image", {"prompt": "a lighthouse"}))
+        return slow, other, result
+
+    slow, other, result = asyncio.run(run())
+    assert "Failed to submit" in result
+    assert slow.stats["prompts"] == 1
+    assert other.stats["prompts"] == 0
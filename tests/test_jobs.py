@@ -0,0 +1,28 @@
+import asyncio
+import json
+
+from helpers import make_stub, mcp_session, serve, text, wait_until
+
+
+def job_id(result) -> str:
+    return text(result).rsplit("Job id: ", 1)[-1]
+
+
+def test_background_jobs_are_tracked_until_collected(tmp_path):
+    async def run():
+        stub = make_stub(latency=1)
+        async with serve(stub.app()) as url:
+            async with mcp_session(url, str(tmp_path)) as session:
+                ids = [job_id(await session.call_tool("submit_image_job", {"prompt": prompt}))
+                       for prompt in ("a lighthouse", "a harbour")]
+                await wait_until(lambda: stub.running)
+                during = json.loads(text(await session.call_tool("get_job_status", {"job_ids": ids})))
+                result = text(await session.call_tool("wait_for_jobs", {"job_ids": ids, "timeout": 10}))
+                after = json.loads(text(await session.call_tool("get_job_status", {})))
+        return stub, ids, during, result, after
+
+    stub, ids, during, result, after = asyncio.run(run())
+    assert [job["status"] for job in during] == ["submitted", "submitted"]
+    assert result.count("Image generated successfully") == 2
+    assert {job["id"]: job["status"] for job in after} == {ids[0]: "done", ids[1]: "done"}
+    assert stub.stats["completed"] == 2
@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+import httpx
+
+from comfy_mcp_server.listener import ComfyEventListener
+from helpers import make_stub, serve
+from stub_comfyui import StubComfyUI
+
+WORKFLOW = {
+    "3": {"class_type": "KSampler", "inputs": {"seed": 1}},
+    "9": {"class_type": "SaveImage", "inputs": {"filename_prefix": "test"}},
+}
+
+
+class RecordingStub(StubComfyUI):
+    """Notes when each websocket event was sent"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sent = {}
+
+    async def send(self, client_id, kind, data):
+        await super().send(client_id, kind, data)
+        self.sent.setdefault(kind, time.perf_counter())
+
+
+async def submit(url: str, client_id: str) -> str:
+    async with httpx.AsyncClient(base_url=url) as http:
+        resp = await http.post("/prompt", json={"prompt": WORKFLOW, "client_id": client_id})
+    return resp.json()["prompt_id"]
+
+
+def test_completion_is_seen_within_milliseconds_of_executed():
+    async def run():
+        stub = make_stub(latency=0.3, stub_class=RecordingStub)
+        async with serve(stub.app()) as url:
+            listener = ComfyEventListener(url, "listener-test")
+            listener.start()
+            try:
+                assert await listener.wait_connected(5)
+                prompt_id = await submit(url, "listener-test")
+                assert await listener.wait(prompt_id, 5)
+                seen = time.perf_counter()
+                state = listener.state(prompt_id)
+            finally:
+                await listener.stop()
+        return stub, state, seen
+
+    stub, state, seen = asyncio.run(run())
+    assert seen - stub.sent["executed"] < 0.05
+    assert state.error is None
+    assert state.outputs["9"]["images"][0]["filename"].startswith("stub_")
+    # Pushed, not polled
+    assert stub.stats["history_requests"] == 0
+
+
+def test_progress_and_errors_are_reported():
+    async def run():
+        stub = make_stub(latency=0.2, steps=4, failure_rate=1.0)
+        async with serve(stub.app()) as url:
+            listener = ComfyEventListener(url, "listener-test")
+            listener.start()
+            try:
+                assert await listener.wait_connected(5)
+                prompt_id = await submit(url, "listener-test")
+                assert await listener.wait(prompt_id, 5)
+                return listener.state(prompt_id)
+            finally:
+                await listener.stop()
+
+    state = asyncio.run(run())
+    assert state.started and state.started_at is not None
+    assert state.progress[1:] == (4, 4)
+    assert state.error == "Simulated failure"
+
+
+def test_wait_times_out_without_events():
+    async def run():
+        listener = ComfyEventListener("http://127.0.0.1:9", "listener-test", reconnect_delay=0.1)
+        listener.start()
+        try:
+            started = time.perf_counter()
+            done = await listener.wait("missing", 0.2)
+            return done, time.perf_counter() - started, listener.connected
+        finally:
+            await listener.stop()
+
+    done, elapsed, connected = asyncio.run(run())
+    assert not done and not connected
+    assert 0.15 < elapsed < 1.0
@@ -0,0 +1,23 @@
+import asyncio
+
+from helpers import make_stub, mcp_session, serve, text
+
+
+def test_non_positive_overrides_are_rejected_before_anything_is_queued(tmp_path):
+    async def run():
+        stub = make_stub(latency=0.1)
+        async with serve(stub.app()) as url:
+            async with mcp_session(url, str(tmp_path)) as session:
+                results = {}
+                for name in ("steps", "batch_size", "width"):
+                    result = await session.call_tool("generate_images", {"prompts": ["a lighthouse"], name: 0})
+                    results[name] = text(result)
+                return stub, results
+
+    stub, results = asyncio.run(run())
+    assert results == {
+        "steps": "steps must be positive.",
+        "batch_size": "batch_size must be positive.",
+        "width": "width and height must be positive.",
+    }
+    assert stub.stats["prompts"] == 0
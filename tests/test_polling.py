@@ -0,0 +1,17 @@
+from types import SimpleNamespace
+
+from comfy_mcp_server import polling
+from comfy_mcp_server.polling import PollSchedule
+
+
+def test_a_learned_render_time_is_slept_through_in_one_go(monkeypatch):
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(polling, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    schedule = PollSchedule(60.0, min_interval=0.25, max_interval=2.0)
+
+    polls = []
+    while clock.now < 60.0:
+        polls.append(clock.now)
+        clock.now += schedule.next_delay()
+    # One sleep to 90% of the expected time, then backing off from the minimum interval
+    assert polls == [0.0, 54.0, 54.25, 54.75, 55.75, 57.75, 59.75]
@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+from starlette.responses import Response
+
+from helpers import make_stub, mcp_session, serve, text
+from stub_comfyui import StubComfyUI
+
+
+class BrokenQueueStub(StubComfyUI):
+    """Cuts the /queue answer short while prompts are waiting, so only the position lookups fail"""
+
+    async def queue(self, request):
+        if request.method == "GET" and self.pending:
+            self.stats["broken_queue"] = self.stats.get("broken_queue", 0) + 1
+            return Response(b"{", headers={"content-length": "64"}, media_type="application/json")
+        return await super().queue(request)
+
+
+@pytest.mark.parametrize("websocket", ["true", "false"])
+def test_renders_finish_when_the_queue_position_cannot_be_read(tmp_path, websocket):
+    async def run():
+        stub = make_stub(latency=0.5, stub_class=BrokenQueueStub)
+        async with serve(stub.app()) as url:
+            env = dict(COMFY_USE_WEBSOCKET=websocket, COMFY_PROGRESS_INTERVAL="0.05", COMFY_HEALTH_INTERVAL="30")
+            async with mcp_session(url, str(tmp_path), **env) as session:
+                async def progress(*_):
+                    pass
+
+                # One worker, so the second prompt waits in the queue and asks for its position
+                results = await asyncio.gather(*[
+                    session.call_tool("generate_image", {"prompt": prompt}, progress_callback=progress)
+                    for prompt in ("a lighthouse", "a harbour")])
+                return stub, "\n".join(text(result) for result in results)
+
+    stub, result = asyncio.run(run())
+    assert stub.stats.get("broken_queue", 0) > 0
+    assert result.count("Image generated successfully") == 2
+    assert stub.stats["deleted"] == 0
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import os
+
+from comfy_mcp_server.jobs import QUEUED, SUBMITTED, JobJournal
+
+from helpers import make_stub, mcp_session, quit_server, serve, start_call, text, wait_until
+
+
+def journaled_jobs(save_dir) -> dict:
+    return JobJournal(os.path.join(save_dir, ".jobs.jsonl")).jobs
+
+
+def test_render_outlives_a_server_restart(tmp_path):
+    async def run():
+        # Long enough to still be rendering when the second server looks for it
+        stub = make_stub(latency=4)
+        async with serve(stub.app()) as url:
+            async with mcp_session(url, str(tmp_path)) as session:
+                call, _ = start_call(session, "generate_image", {"prompt": "a lighthouse"})
+                await wait_until(lambda: stub.running)
+                # The client quits without cancelling, as when it is closed mid-call
+                call.cancel()
+                await quit_server(session)
+            jobs = journaled_jobs(tmp_path)
+
+            async with mcp_session(url, str(tmp_path)) as session:
+                result = text(await session.call_tool("wait_for_jobs", {"job_ids": list(jobs), "timeout": 10}))
+        return stub, jobs, result
+
+    stub, jobs, result = asyncio.run(run())
+    assert [job["status"] for job in jobs.values()] == [SUBMITTED]
+    assert "Image generated successfully" in result
+    assert stub.stats["interrupted"] == 0
+    assert stub.stats["deleted"] == 0
+    assert stub.stats["completed"] == 1
+
+
+def test_background_job_outlives_a_server_restart(tmp_path):
+    async def run():
+        stub = make_stub(latency=4)
+        async with serve(stub.app()) as url:
+            # One prompt at a time, so the second job is still waiting for a slot when the server stops
+            async with mcp_session(url, str(tmp_path), COMFY_MAX_IN_FLIGHT="1") as session:
+                ids = [text(await session.call_tool("submit_image_job", {"prompt": prompt})).rsplit("Job id: ", 1)[-1]
+                       for prompt in ("a lighthouse", "a harbour")]
+                await wait_until(lambda: stub.running)
+                await quit_server(session)
+            jobs = journaled_jobs(tmp_path)
+
+            async with mcp_session(url, str(tmp_path)) as session:
+                result = text(await session.call_tool("wait_for_jobs", {"job_ids": ids, "timeout": 10}))
+        return stub, ids, jobs, result
+
+    stub, ids, jobs, result = asyncio.run(run())
+    assert [jobs[job_id]["status"] for job_id in ids] == [SUBMITTED, QUEUED]
+    assert "Image generated successfully" in result
+    assert "the server restarted before it was submitted" in result
+    assert stub.stats["interrupted"] == 0
+    assert stub.stats["deleted"] == 0
+    assert stub.stats["completed"] == 1
+
+
+def test_servers_sharing_the_journal_leave_each_others_jobs_alone(tmp_path):
+    async def run():
+        stub = make_stub(latency=2)
+        async with serve(stub.app()) as url:
+            async with mcp_session(url, str(tmp_path)) as first:
+                job_id = text(await first.call_tool("submit_image_job", {"prompt": "a lighthouse"})).rsplit("Job id: ", 1)[-1]
+                await wait_until(lambda: stub.running)
+                # Another client starts its server while the job renders
+                async with mcp_session(url, str(tmp_path)) as second:
+                    listed = json.loads(text(await second.call_tool("get_job_status", {})))
+                    await second.call_tool("wait_for_jobs", {"job_ids": [job_id], "timeout": 3})
+                result = text(await first.call_tool("wait_for_jobs", {"job_ids": [job_id], "timeout": 10}))
+        return stub, job_id, listed, result
+
+    stub, job_id, listed, result = asyncio.run(run())
+    assert listed == []
+    assert "Image generated successfully" in result
+    assert stub.stats["view_requests"] == 1
+    with open(tmp_path / ".jobs.jsonl") as f:
+        records = [json.loads(line) for line in f]
+    assert [r["status"] for r in records if r["id"] == job_id and r.get("status") in ("rendered", "done")] == [
+        "rendered", "done"]
+
+
+def test_jobs_are_taken_over_only_once_their_server_is_gone(tmp_path):
+    path = str(tmp_path / ".jobs.jsonl")
+    first = JobJournal(path)
+    first.record("a", status=QUEUED, created=0)
+    first.record("a", status=SUBMITTED, prompt_id="p")
+    second = JobJournal(path)
+
+    assert second.claim() == []
+    assert second.recent() == []
+    first.close()
+    assert second.claim() == ["a"]
+    # Taken over by a running server, so a third one leaves it alone
+    assert JobJournal(path).claim() == []
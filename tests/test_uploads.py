@@ -0,0 +1,71 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import httpx
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+
+from helpers import ROOT, WORKFLOW, free_port, make_stub, mcp_session, serve
+from stub_comfyui import make_png
+
+
+def test_path_uploads_stay_inside_the_upload_dir(tmp_path):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    (uploads / "cat.png").write_bytes(make_png(16, 16))
+    (tmp_path / "secret.png").write_bytes(make_png(16, 16))
+
+    async def run():
+        stub = make_stub()
+        async with serve(stub.app()) as url:
+            async with mcp_session(url, str(tmp_path / "out"), COMFY_UPLOAD_DIR=str(uploads)) as session:
+                results = []
+                for path in ("cat.png", str(uploads / "cat.png"), "../secret.png", str(tmp_path / "secret.png")):
+                    result = await session.call_tool("upload_image", {"path": path})
+                    results.append(result.content[0].text)
+        return stub, results
+
+    stub, results = asyncio.run(run())
+    assert [result.startswith("Image handle:") for result in results] == [True, True, False, False]
+    assert results[2] == results[3] == "Only files in COMFY_UPLOAD_DIR can be uploaded by path."
+    assert stub.stats["uploads"] == 1
+
+
+def test_network_clients_cannot_upload_by_path(tmp_path):
+    image = tmp_path / "cat.png"
+    image.write_bytes(make_png(16, 16))
+
+    async def run():
+        stub = make_stub()
+        async with serve(stub.app()) as url:
+            port = free_port()
+            env = dict(
+                os.environ,
+                PYTHONPATH=os.path.join(ROOT, "src"),
+                COMFY_URL=url,
+                COMFY_WORKFLOW_JSON_FILE=WORKFLOW,
+                COMFY_LOCAL_SAVE_DIR=str(tmp_path / "out"),
+                COMFY_MCP_TRANSPORT="streamable-http",
+                COMFY_MCP_PORT=str(port),
+            )
+            server = subprocess.Popen([sys.executable, "-m", "comfy_mcp_server"], env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                async with httpx.AsyncClient() as client:
+                    for _ in range(100):
+                        try:
+                            await client.get(f"http://127.0.0.1:{port}/mcp")
+                            break
+                        except httpx.TransportError:
+                            await asyncio.sleep(0.1)
+                async with streamablehttp_client(f"http://127.0.0.1:{port}/mcp") as (read, write, _):
+                    async with ClientSession(read, write) as session:
+                        await session.initialize()
+                        return (await session.call_tool("upload_image", {"path": str(image)})).content[0].text
+            finally:
+                server.terminate()
+                server.wait()
+
+    assert asyncio.run(run()) == "Uploading by path is off for network clients, send the image as data instead."